@@ -1,10 +1,41 @@
 import os
 import atexit
+import threading
+import time
+from contextlib import contextmanager
 from flask import Flask, jsonify, render_template, redirect, request, url_for
-from sqlalchemy import text
+from sqlalchemy import event, text
 from .config import Config
 from .extensions import db, jwt, bcrypt, mail, mongo, limiter
 
+# Bump whenever models or _apply_sqlite_compat_migrations change; databases
+# stamped with this PRAGMA user_version skip create_all and migrations on boot.
+SQLITE_SCHEMA_VERSION = 3
+
+SQLITE_INDEXES = {
+    "ix_login_log_email": ("login_log", "email"),
+    "ix_login_log_timestamp": ("login_log", "timestamp"),
+    "ix_password_reset_token_user_id": ("password_reset_token", "user_id"),
+    "ix_password_reset_token_expires_at": ("password_reset_token", "expires_at"),
+}
+
+
+def _configure_sqlite(app):
+    if not app.config.get("SQLALCHEMY_DATABASE_URI", "").startswith("sqlite:"):
+        return
+    journal_mode = app.config.get("SQLITE_JOURNAL_MODE", "WAL")
+    synchronous = app.config.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    busy_timeout = int(app.config.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.close()
+
+    event.listen(db.engine, "connect", set_pragmas)
+
 
 def _apply_sqlite_compat_migrations(app):
     db_uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
@@ -34,9 +65,43 @@ def _apply_sqlite_compat_migrations(app):
             conn.execute(text("ALTER TABLE user ADD COLUMN created_at DATETIME"))
         if "updated_at" not in columns:
             conn.execute(text("ALTER TABLE user ADD COLUMN updated_at DATETIME"))
+
+        # create_all() only indexes tables it creates; older databases get them here.
+        tables = {
+            row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'")).fetchall()
+        }
+        for index_name, (table, column) in SQLITE_INDEXES.items():
+            if table in tables:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column})"))
         conn.commit()
 
 
+def _prepare_database(app):
+    _configure_sqlite(app)
+    is_sqlite = app.config.get("SQLALCHEMY_DATABASE_URI", "").startswith("sqlite:")
+    if is_sqlite:
+        with db.engine.connect() as conn:
+            if conn.execute(text("PRAGMA user_version")).scalar() >= SQLITE_SCHEMA_VERSION:
+                return False
+
+    db.create_all()
+    _apply_sqlite_compat_migrations(app)
+    if is_sqlite:
+        with db.engine.connect() as conn:
+            conn.execute(text(f"PRAGMA user_version = {SQLITE_SCHEMA_VERSION}"))
+            conn.commit()
+    return True
+
+
+def _admin_is_current(admin, password):
+    if not admin or admin.role != "admin" or not admin.active:
+        return False
+    try:
+        return bcrypt.check_password_hash(admin.password, password)
+    except ValueError:
+        return False
+
+
 def _ensure_default_admin():
     from .models.user_model import User
 
@@ -44,6 +109,9 @@ def _ensure_default_admin():
     admin_password = os.environ.get("DEFAULT_ADMIN_PASSWORD", "admin123")
 
     admin = User.query.filter_by(email=admin_email).first()
+    # Verifying costs one bcrypt round but avoids a fresh hash and a write on every boot.
+    if _admin_is_current(admin, admin_password):
+        return
     hashed_pw = bcrypt.generate_password_hash(admin_password).decode("utf-8")
 
     if not admin:
@@ -56,32 +124,148 @@ def _ensure_default_admin():
     db.session.commit()
 
 
+def _ensure_mongo_indexes_in_background(app):
+    from .services.index_service import ensure_mongo_indexes
+
+    def run():
+        with app.app_context():
+            try:
+                ensure_mongo_indexes(mongo.db, app.config.get("PREDICTION_LOG_TTL_DAYS", 0))
+            except Exception as exc:
+                app.logger.warning("MongoDB index setup skipped: %s", exc)
+
+    # Index builds must not hold up worker boot when Mongo is slow or unreachable.
+    threading.Thread(target=run, name="mongo-indexes", daemon=True).start()
+
+
+def _warmup_in_background(app):
+    from .services.model_service import warmup
+
+    def run():
+        start = time.perf_counter()
+        with app.app_context():
+            try:
+                warmup()
+            except Exception as exc:
+                app.logger.warning("Model warmup failed: %s", exc)
+                return
+        app.logger.info("Model warmup finished in %.0f ms", (time.perf_counter() - start) * 1000.0)
+
+    threading.Thread(target=run, name="model-warmup", daemon=True).start()
+
+
 def create_app():
+    from .services import metrics
+
+    timings = []
+
+    @contextmanager
+    def phase(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings.append((name, time.perf_counter() - start))
+
     app = Flask(__name__, template_folder='templates', static_folder='static')
     app.config.from_object(Config)
 
-    db.init_app(app)
-    jwt.init_app(app)
-    bcrypt.init_app(app)
-    mail.init_app(app)
-    mongo.init_app(app)
-    limiter.init_app(app)
+    with phase("extensions"):
+        db.init_app(app)
+        jwt.init_app(app)
+        bcrypt.init_app(app)
+        mail.init_app(app)
+        mongo.init_app(app)
+        limiter.init_app(app)
 
     with app.app_context():
         # Ensure model metadata is loaded before create_all.
         from .models import user_model  # noqa: F401
 
-        db.create_all()
-        _apply_sqlite_compat_migrations(app)
-        _ensure_default_admin()
+        with phase("schema"):
+            schema_migrated = _prepare_database(app)
+        if app.config.get("ENSURE_DEFAULT_ADMIN", True):
+            with phase("default_admin"):
+                _ensure_default_admin()
+
+    if app.config.get("MONGO_ENSURE_INDEXES"):
+        _ensure_mongo_indexes_in_background(app)
+
+    with phase("blueprints"):
+        from .routes.auth_routes import auth_bp
+        from .routes.prediction_routes import prediction_bp
+        from .routes.admin_routes import admin_bp
+        from .routes.metrics_routes import metrics_bp, register_request_metrics
+        from .services import auth_cache, auth_maintenance, mail_queue, ocr_service, profiling_service, quota_service
+
+        app.register_blueprint(auth_bp)
+        app.register_blueprint(prediction_bp)
+        app.register_blueprint(admin_bp)
+        app.register_blueprint(metrics_bp)
+
+    with phase("services"):
+        metrics.configure(app.config.get("METRICS_DIR"), app.config.get("METRICS_FLUSH_SECONDS", 5.0))
+        register_request_metrics(app)
+        auth_cache.configure(app.config.get("AUTH_CACHE_TTL_SECONDS", 30.0))
+        mail_queue.configure(
+            batch_size=app.config.get("MAIL_QUEUE_BATCH_SIZE", 20),
+            max_attempts=app.config.get("MAIL_QUEUE_MAX_ATTEMPTS", 5),
+            retry_base_seconds=app.config.get("MAIL_QUEUE_RETRY_SECONDS", 30.0),
+            poll_seconds=app.config.get("MAIL_QUEUE_POLL_SECONDS", 5.0),
+        )
+        mail_queue.start_dispatcher(app)
+        auth_maintenance.configure(
+            batch_size=app.config.get("LOGIN_LOG_BATCH_SIZE", 50),
+            flush_seconds=app.config.get("LOGIN_LOG_FLUSH_SECONDS", 1.0),
+            login_log_days=app.config.get("LOGIN_LOG_RETENTION_DAYS", 90),
+            reset_token_days=app.config.get("RESET_TOKEN_RETENTION_DAYS", 1),
+            outbound_email_days=app.config.get("OUTBOUND_EMAIL_RETENTION_DAYS", 7),
+            retention_seconds=app.config.get("AUTH_RETENTION_INTERVAL_SECONDS", 3600.0),
+        )
+        auth_maintenance.start_background(app)
+        profiling_service.configure(app.config.get("PROFILE_DIR"), app.config.get("PROFILE_MAX_FILES", 200))
+        ocr_service.configure(
+            max_workers=app.config.get("OCR_MAX_WORKERS", 2),
+            queue_size=app.config.get("OCR_QUEUE_SIZE", 8),
+            timeout=app.config.get("OCR_TIMEOUT_SECONDS", 20.0),
+            cache_size=app.config.get("OCR_CACHE_SIZE", 512),
+            target_dpi=app.config.get("OCR_TARGET_DPI", 300),
+            max_width=app.config.get("OCR_MAX_WIDTH", 1600),
+            crop_top=app.config.get("OCR_CROP_TOP", 0.0),
+            crop_bottom=app.config.get("OCR_CROP_BOTTOM", 0.0),
+        )
+        quota_service.configure(
+            app.config.get("QUOTA_DB") if app.config.get("QUOTA_ENABLED", True) else None,
+            capacity=app.config.get("QUOTA_BURST", 20.0),
+            refill_per_minute=app.config.get("QUOTA_REFILL_PER_MINUTE", 20.0),
+            base_cost=app.config.get("QUOTA_BASE_COST", 1.0),
+            chunk_cost=app.config.get("QUOTA_CHUNK_COST", 0.25),
+            ocr_cost=app.config.get("QUOTA_OCR_COST", 3.0),
+        )
+
+    from .cli import register_commands
+
+    register_commands(app)
+
+    # "background" loads spaCy and the model off the request path, "eager"
+    # blocks startup on it, "lazy" waits for the first prediction.
+    warmup_mode = app.config.get("MODEL_WARMUP", "background")
+    if warmup_mode == "eager":
+        from .services.model_service import warmup
 
-    from .routes.auth_routes import auth_bp
-    from .routes.prediction_routes import prediction_bp
-    from .routes.admin_routes import admin_bp
+        with app.app_context(), phase("warmup"):
+            warmup()
+    elif warmup_mode == "background":
+        _warmup_in_background(app)
 
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(prediction_bp)
-    app.register_blueprint(admin_bp)
+    for name, seconds in timings:
+        metrics.set_gauge("emotion_startup_seconds", round(seconds, 4), phase=name)
+    app.logger.info(
+        "Startup took %.0f ms (%s; schema %s)",
+        sum(seconds for _, seconds in timings) * 1000.0,
+        ", ".join(f"{name} {seconds * 1000.0:.0f} ms" for name, seconds in timings),
+        "migrated" if schema_migrated else "up to date",
+    )
 
     @app.route('/')
     def home():
@@ -0,0 +1,84 @@
+import click
+from .extensions import mongo
+
+
+def register_commands(app):
+    @app.cli.command("artifacts-gc")
+    @click.option("--retain", default=5, show_default=True, help="Newest versions to keep.")
+    @click.option("--dry-run", is_flag=True, help="Report what would be removed.")
+    def artifacts_gc(retain, dry_run):
+        """Prune unreferenced model versions and artifact blobs from ml/."""
+        from .services import artifact_store
+
+        protected = set()
+        try:
+            for doc in mongo.db.models.find({"status": "active"}, {"version": 1}):
+                protected.add(doc.get("version"))
+        except Exception:
+            click.echo("MongoDB unavailable; only the local pointer protects versions.")
+
+        result = artifact_store.collect_garbage(
+            retain=retain, protected_versions=protected, dry_run=dry_run
+        )
+        if result["pruned_versions"] and not dry_run:
+            try:
+                mongo.db.models.update_many(
+                    {"version": {"$in": result["pruned_versions"]}, "status": {"$ne": "active"}},
+                    {"$set": {"status": "pruned"}},
+                )
+            except Exception:
+                pass
+
+        verb = "Would remove" if dry_run else "Removed"
+        click.echo(
+            f"{verb} {result['removed_files']} file(s), {result['freed_bytes']} bytes; "
+            f"pruned {len(result['pruned_versions'])} version(s), kept {len(result['kept_versions'])}."
+        )
+
+
+    @app.cli.command("compact-predictions")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def compact_predictions(batch_size):
+        """Rewrite full prediction log entries into the compact format."""
+        from flask import current_app
+        from .services.model_service import EMOTION_LABELS, model_classes
+        from .services.prediction_log import compact_existing
+
+        converted, skipped = compact_existing(
+            mongo.db.predictions, EMOTION_LABELS, current_app.config, model_classes, batch_size=batch_size
+        )
+        click.echo(f"Compacted {converted} prediction document(s).")
+        if skipped:
+            click.echo(f"Left {skipped} document(s) whose label order is unknown in the full format.")
+
+
+    @app.cli.command("backfill-dataset-hashes")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def backfill_dataset_hashes(batch_size):
+        """Add content_hash to dataset rows stored before uploads were deduplicated."""
+        from .services.dataset_service import backfill_content_hashes
+
+        stats = backfill_content_hashes(mongo.db.datasets, batch_size=batch_size)
+        click.echo(f"Hashed {stats['hashed']} dataset row(s); removed {stats['duplicates']} duplicate(s).")
+
+
+    @app.cli.command("prune-auth-data")
+    def prune_auth_data():
+        """Delete expired reset tokens, old login logs and delivered emails now."""
+        from .services import auth_maintenance
+
+        auth_maintenance.flush_login_logs()
+        removed = auth_maintenance.prune_auth_data()
+        click.echo(
+            f"Removed {removed['login_logs']} login log(s), {removed['reset_tokens']} reset token(s), "
+            f"{removed['outbound_emails']} outbound email(s)."
+        )
+
+
+    @app.cli.command("ensure-admin")
+    def ensure_admin():
+        """Create or reset the default admin from DEFAULT_ADMIN_EMAIL/PASSWORD."""
+        from . import _ensure_default_admin
+
+        _ensure_default_admin()
+        click.echo("Default admin is up to date.")
@@ -9,13 +9,82 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "change-this-in-prod")
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(INSTANCE_DIR, 'users.db')}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied to every new SQLite connection; WAL lets logins read while another worker writes.
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    LOGIN_LOG_BATCH_SIZE = int(os.environ.get("LOGIN_LOG_BATCH_SIZE", "50"))
+    LOGIN_LOG_FLUSH_SECONDS = float(os.environ.get("LOGIN_LOG_FLUSH_SECONDS", "1"))
+    LOGIN_LOG_RETENTION_DAYS = float(os.environ.get("LOGIN_LOG_RETENTION_DAYS", "90"))
+    RESET_TOKEN_RETENTION_DAYS = float(os.environ.get("RESET_TOKEN_RETENTION_DAYS", "1"))
+    OUTBOUND_EMAIL_RETENTION_DAYS = float(os.environ.get("OUTBOUND_EMAIL_RETENTION_DAYS", "7"))
+    AUTH_RETENTION_INTERVAL_SECONDS = float(os.environ.get("AUTH_RETENTION_INTERVAL_SECONDS", "3600"))
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "jwt-change-this")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.environ.get("JWT_EXP_MIN", "15")))
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", "587"))
-    MAIL_USE_TLS = True
+    MAIL_USE_TLS = os.environ.get("MAIL_USE_TLS", "1") == "1"
     MAIL_USERNAME = os.environ.get("MAIL_USERNAME", "")
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD", "")
     MAIL_DEFAULT_SENDER = os.environ.get("MAIL_DEFAULT_SENDER", os.environ.get("MAIL_USERNAME", ""))
+    # How long a worker trusts its cached copy of a user's role/active flag.
+    AUTH_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "30"))
+    MAIL_QUEUE_BATCH_SIZE = int(os.environ.get("MAIL_QUEUE_BATCH_SIZE", "20"))
+    MAIL_QUEUE_MAX_ATTEMPTS = int(os.environ.get("MAIL_QUEUE_MAX_ATTEMPTS", "5"))
+    MAIL_QUEUE_RETRY_SECONDS = float(os.environ.get("MAIL_QUEUE_RETRY_SECONDS", "30"))
+    MAIL_QUEUE_POLL_SECONDS = float(os.environ.get("MAIL_QUEUE_POLL_SECONDS", "5"))
+    MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "background")
+    # Set to 0 when a deploy step runs `flask ensure-admin` once instead of every worker boot.
+    ENSURE_DEFAULT_ADMIN = os.environ.get("ENSURE_DEFAULT_ADMIN", "1") == "1"
     MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/emotion_system")
+    MONGO_ENSURE_INDEXES = os.environ.get("MONGO_ENSURE_INDEXES", "1") == "1"
+    # "full" keeps raw/clean text and every probability; "compact" keeps the
+    # top-k label indices with float16 probabilities and a text hash.
+    PREDICTION_LOG_MODE = os.environ.get("PREDICTION_LOG_MODE", "full")
+    PREDICTION_LOG_TOP_K = int(os.environ.get("PREDICTION_LOG_TOP_K", "3"))
+    PREDICTION_LOG_TEXT = os.environ.get("PREDICTION_LOG_TEXT", "hash")
+    PREDICTION_LOG_TTL_DAYS = float(os.environ.get("PREDICTION_LOG_TTL_DAYS", "0"))
+    # Each worker periodically writes its counters here; /metrics merges them.
+    METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(INSTANCE_DIR, "metrics"))
+    METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(INSTANCE_DIR, "profiles"))
+    PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "200"))
+    # Concurrent tesseract runs per worker, plus how many more may wait for a slot.
+    OCR_MAX_WORKERS = int(os.environ.get("OCR_MAX_WORKERS", "2"))
+    OCR_QUEUE_SIZE = int(os.environ.get("OCR_QUEUE_SIZE", "8"))
+    OCR_TIMEOUT_SECONDS = float(os.environ.get("OCR_TIMEOUT_SECONDS", "20"))
+    OCR_CACHE_SIZE = int(os.environ.get("OCR_CACHE_SIZE", "512"))
+    OCR_TARGET_DPI = int(os.environ.get("OCR_TARGET_DPI", "300"))
+    OCR_MAX_WIDTH = int(os.environ.get("OCR_MAX_WIDTH", "1600"))
+    # Fractions trimmed off the top/bottom of tall (portrait phone) screenshots; 0 disables.
+    OCR_CROP_TOP = float(os.environ.get("OCR_CROP_TOP", "0"))
+    OCR_CROP_BOTTOM = float(os.environ.get("OCR_CROP_BOTTOM", "0"))
+    PREDICT_MAX_IMAGES = int(os.environ.get("PREDICT_MAX_IMAGES", "10"))
     RATELIMIT_DEFAULT = os.environ.get("RATELIMIT_DEFAULT", "10 per minute")
+    # Per-user token bucket for /predict, charged by input size: a short text
+    # costs QUOTA_BASE_COST, each extra long-text chunk QUOTA_CHUNK_COST and
+    # each OCR'd image QUOTA_OCR_COST. Shared by all workers through QUOTA_DB.
+    QUOTA_ENABLED = os.environ.get("QUOTA_ENABLED", "1") == "1"
+    QUOTA_DB = os.environ.get("QUOTA_DB", os.path.join(INSTANCE_DIR, "quota.db"))
+    QUOTA_BURST = float(os.environ.get("QUOTA_BURST", "20"))
+    QUOTA_REFILL_PER_MINUTE = float(os.environ.get("QUOTA_REFILL_PER_MINUTE", "20"))
+    QUOTA_BASE_COST = float(os.environ.get("QUOTA_BASE_COST", "1"))
+    QUOTA_CHUNK_COST = float(os.environ.get("QUOTA_CHUNK_COST", "0.25"))
+    QUOTA_OCR_COST = float(os.environ.get("QUOTA_OCR_COST", "3"))
+    DATASET_INSERT_BATCH_SIZE = int(os.environ.get("DATASET_INSERT_BATCH_SIZE", "1000"))
+    # Estimated Jaccard similarity above which same-label training rows are
+    # collapsed before fitting (0 disables near-duplicate removal).
+    NEAR_DUP_THRESHOLD = float(os.environ.get("NEAR_DUP_THRESHOLD", "0.8"))
+    NEAR_DUP_NUM_PERM = int(os.environ.get("NEAR_DUP_NUM_PERM", "64"))
+    BENCHMARK_SAMPLE_SIZE = int(os.environ.get("BENCHMARK_SAMPLE_SIZE", "200"))
+    # Refuse promotion when the new model's p99 latency exceeds the active
+    # model's by more than this factor (0 disables the gate).
+    MAX_P99_LATENCY_REGRESSION = float(os.environ.get("MAX_P99_LATENCY_REGRESSION", "1.5"))
+    COMPACT_MODEL_ENABLED = os.environ.get("COMPACT_MODEL_ENABLED", "1") == "1"
+    COMPACT_COEF_THRESHOLD = float(os.environ.get("COMPACT_COEF_THRESHOLD", "0.01"))
+    COMPACT_DTYPE = os.environ.get("COMPACT_DTYPE", "float32")
+    COMPACT_MIN_AGREEMENT = float(os.environ.get("COMPACT_MIN_AGREEMENT", "0.98"))
+    # Serve with a vectorizer that indexes bigrams by word-id pairs instead of
+    # the pickled string vocabulary; output is identical, memory and time lower.
+    COMPACT_VECTORIZER_ENABLED = os.environ.get("COMPACT_VECTORIZER_ENABLED", "1") == "1"
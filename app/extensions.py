@@ -11,4 +11,15 @@ jwt = JWTManager()
 bcrypt = Bcrypt()
 mail = Mail()
 mongo = PyMongo()
-limiter = Limiter(key_func=get_remote_address)
+
+
+def _covered_by_quota():
+    # Prediction POSTs are metered by the per-user cost quota instead of the
+    # flat per-IP default; explicit limits (login, reset) still apply.
+    from flask import request
+    from .services import quota_service
+
+    return quota_service.enabled() and request.blueprint == "prediction" and request.method == "POST"
+
+
+limiter = Limiter(key_func=get_remote_address, default_limits_exempt_when=_covered_by_quota)
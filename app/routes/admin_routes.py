@@ -1,31 +1,59 @@
-import csv
-import io
 import os
-from flask import Blueprint, jsonify, render_template, request, current_app
+from datetime import datetime, timezone
+from flask import Blueprint, Response, jsonify, render_template, request, current_app, send_file
 from flask_jwt_extended import jwt_required
 from ..extensions import mongo
+from ..services.analytics_service import GRANULARITIES, MAX_BUCKETS, bucket_step, query_rollups
+from ..services import profiling_service
+from ..services.dataset_service import ingest_records, iter_csv_records, open_text_stream
+from ..services.model_service import EMOTION_LABELS, model_classes
+from ..services.pagination import keyset_page
+from ..services.prediction_log import decode_log_document
 from ..utils.security import allowed_file, role_required
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+DEFAULT_PAGE_SIZE = 20
+MODEL_LIST_PROJECTION = {
+    "version": 1,
+    "status": 1,
+    "metrics.accuracy": 1,
+    "serving.latency_ms.p99": 1,
+    "created_at": 1,
+}
 
 
-def _normalize_key(key):
-    return str(key or "").replace("\ufeff", "").strip().strip('"').strip("'").lower()
+@admin_bp.route("/dashboard", methods=["GET"])
+def admin_home():
+    return render_template("admin_dashboard.html")
 
 
-def _row_value(row, name):
-    target = _normalize_key(name)
-    for k, v in (row or {}).items():
-        if _normalize_key(k) == target:
-            return v
-    return ""
+def _page_args():
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    return limit, request.args.get("cursor") or None
 
 
-@admin_bp.route("/dashboard", methods=["GET"])
-def admin_home():
-    return render_template("admin_dashboard.html")
+def _iso(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _utc_timestamp(value):
+    # Rollups are keyed by naive UTC; an explicit offset is converted to it.
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _model_summary(m):
+    return {
+        "version": m.get("version"),
+        "status": m.get("status"),
+        "accuracy": (m.get("metrics") or {}).get("accuracy"),
+        "p99_latency_ms": ((m.get("serving") or {}).get("latency_ms") or {}).get("p99"),
+        "created_at": _iso(m.get("created_at")),
+    }
 
 
 @admin_bp.route("/bootstrap", methods=["GET"])
@@ -33,21 +61,172 @@ def admin_home():
 @role_required("admin")
 def admin_bootstrap():
     models = []
+    next_cursor = None
     mongo_error = None
     try:
-        raw_models = list(mongo.db.models.find().sort("created_at", -1))
-        for m in raw_models:
-            models.append(
-                {
-                    "version": m.get("version"),
-                    "status": m.get("status"),
-                    "accuracy": (m.get("metrics") or {}).get("accuracy"),
-                }
-            )
+        page, next_cursor = keyset_page(
+            mongo.db.models, "created_at", MODEL_LIST_PROJECTION, DEFAULT_PAGE_SIZE
+        )
+        models = [_model_summary(m) for m in page]
     except Exception:
         mongo_error = "MongoDB is unavailable. Admin features are limited."
 
-    return jsonify({"models": models, "mongo_error": mongo_error})
+    return jsonify({"models": models, "next_cursor": next_cursor, "mongo_error": mongo_error})
+
+
+@admin_bp.route("/models", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def list_models():
+    limit, cursor = _page_args()
+    try:
+        page, next_cursor = keyset_page(
+            mongo.db.models, "created_at", MODEL_LIST_PROJECTION, limit, cursor
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    except Exception:
+        return jsonify({"error": "MongoDB is unavailable"}), 503
+    return jsonify({"models": [_model_summary(m) for m in page], "next_cursor": next_cursor})
+
+
+@admin_bp.route("/datasets", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def list_datasets():
+    limit, cursor = _page_args()
+    try:
+        page, next_cursor = keyset_page(
+            mongo.db.datasets, "_id", {"text": 1, "label": 1}, limit, cursor
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    except Exception:
+        return jsonify({"error": "MongoDB is unavailable"}), 503
+    rows = [{"id": str(d["_id"]), "text": d.get("text"), "label": d.get("label")} for d in page]
+    return jsonify({"datasets": rows, "next_cursor": next_cursor})
+
+
+@admin_bp.route("/predictions", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def list_predictions():
+    limit, cursor = _page_args()
+    query = {}
+    if request.args.get("model_version"):
+        query["model_version"] = request.args["model_version"]
+    try:
+        page, next_cursor = keyset_page(
+            mongo.db.predictions,
+            "created_at",
+            {"clean_text": 0, "text": 0},
+            limit,
+            cursor,
+            query,
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    except Exception:
+        return jsonify({"error": "MongoDB is unavailable"}), 503
+    rows = []
+    for p in page:
+        decoded = decode_log_document(p, EMOTION_LABELS, model_classes)
+        rows.append(
+            {
+                "predicted": decoded["predicted"],
+                "top": decoded["top"][:3],
+                "model_version": decoded["model_version"],
+                "created_at": _iso(decoded["created_at"]),
+            }
+        )
+    return jsonify({"predictions": rows, "next_cursor": next_cursor})
+
+
+@admin_bp.route("/analytics", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def prediction_analytics():
+    granularity = request.args.get("granularity", "hour")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of: {', '.join(GRANULARITIES)}"}), 400
+    try:
+        since = _utc_timestamp(request.args["since"]) if request.args.get("since") else None
+        until = _utc_timestamp(request.args["until"]) if request.args.get("until") else None
+    except ValueError:
+        return jsonify({"error": "since/until must be ISO-8601 timestamps"}), 400
+
+    until = until or datetime.utcnow()
+    step = bucket_step(granularity)
+    since = since or until - step * 24
+    # Bound the window so a minute-level query cannot span months.
+    since = max(since, until - step * MAX_BUCKETS)
+    try:
+        buckets = query_rollups(granularity, since, until, request.args.get("model_version"))
+    except Exception:
+        return jsonify({"error": "MongoDB is unavailable"}), 503
+    return jsonify(
+        {
+            "granularity": granularity,
+            "since": since.isoformat(),
+            "until": until.isoformat(),
+            "buckets": buckets,
+        }
+    )
+
+
+@admin_bp.route("/profiling", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def profiling_status():
+    return jsonify(profiling_service.status())
+
+
+@admin_bp.route("/profiling", methods=["POST"])
+@jwt_required()
+@role_required("admin")
+def enable_profiling():
+    data = request.get_json(silent=True) or {}
+    try:
+        sample_rate = float(data.get("sample_rate", 0.05))
+        duration = float(data.get("duration_seconds", 300))
+    except (TypeError, ValueError):
+        return jsonify({"error": "sample_rate and duration_seconds must be numbers"}), 400
+    if not 0 < sample_rate <= 1 or duration <= 0:
+        return jsonify({"error": "sample_rate must be in (0, 1] and duration_seconds > 0"}), 400
+    return jsonify(profiling_service.enable(sample_rate, duration))
+
+
+@admin_bp.route("/profiling", methods=["DELETE"])
+@jwt_required()
+@role_required("admin")
+def disable_profiling():
+    return jsonify(profiling_service.disable())
+
+
+@admin_bp.route("/profiling/profiles", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def list_profiles():
+    profiles = profiling_service.list_profiles()
+    for p in profiles:
+        p["mtime"] = datetime.utcfromtimestamp(p["mtime"]).isoformat()
+    return jsonify({"profiles": profiles})
+
+
+@admin_bp.route("/profiling/profiles/<name>", methods=["GET"])
+@jwt_required()
+@role_required("admin")
+def download_profile(name):
+    path = profiling_service.profile_path(name)
+    if not path:
+        return jsonify({"error": "Profile not found"}), 404
+    if request.args.get("format") == "collapsed":
+        return Response(
+            profiling_service.to_collapsed(path),
+            mimetype="text/plain",
+            headers={"Content-Disposition": f"attachment; filename={name[:-7]}.collapsed.txt"},
+        )
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=name)
 
 
 @admin_bp.route("/dataset", methods=["POST"])
@@ -61,9 +240,11 @@ def upload_dataset():
     if not files:
         return jsonify({"error": "No file"}), 400
 
-    all_records = []
+    stats = {"inserted": 0, "duplicates": 0, "invalid": 0, "fallback": False}
     processed_files = 0
     invalid_files = []
+    fallback_csv = os.path.join(DATA_DIR, "uploaded_dataset_fallback.csv")
+    batch_size = current_app.config.get("DATASET_INSERT_BATCH_SIZE", 1000)
 
     try:
         for f in files:
@@ -71,40 +252,33 @@ def upload_dataset():
                 invalid_files.append(f.filename)
                 continue
 
-            content = f.read().decode("utf-8", errors="ignore")
-            reader = csv.DictReader(io.StringIO(content))
-            file_records = []
-            for row in reader:
-                text = str(_row_value(row, "text")).strip()
-                label = str(_row_value(row, "label")).strip()
-                if text and label:
-                    file_records.append({"text": text, "label": label})
-
-            if file_records:
-                all_records.extend(file_records)
+            before = stats["inserted"] + stats["duplicates"]
+            records = iter_csv_records(open_text_stream(f.stream))
+            ingest_records(records, mongo.db.datasets, fallback_csv, batch_size, stats)
+            if stats["inserted"] + stats["duplicates"] > before:
                 processed_files += 1
 
-        if not all_records:
+        if not stats["inserted"] and not stats["duplicates"]:
             return jsonify({"error": "No valid rows found. Expected CSV columns: text,label"}), 400
 
         fallback_msg = ""
-        try:
-            mongo.db.datasets.insert_many(all_records)
-        except Exception:
-            os.makedirs(DATA_DIR, exist_ok=True)
-            fallback_csv = os.path.join(DATA_DIR, "uploaded_dataset_fallback.csv")
-            write_header = not os.path.exists(fallback_csv)
-            with open(fallback_csv, "a", newline="", encoding="utf-8") as fh:
-                writer = csv.DictWriter(fh, fieldnames=["text", "label"])
-                if write_header:
-                    writer.writeheader()
-                writer.writerows(all_records)
+        if stats["fallback"]:
             fallback_msg = " MongoDB unavailable, saved locally to data/uploaded_dataset_fallback.csv."
 
-        msg = f"Dataset uploaded ({len(all_records)} rows from {processed_files} file(s)).{fallback_msg}"
+        msg = (
+            f"Dataset uploaded ({stats['inserted']} new rows, {stats['duplicates']} duplicates, "
+            f"{stats['invalid']} invalid from {processed_files} file(s)).{fallback_msg}"
+        )
         if invalid_files:
             msg += f". Skipped invalid file(s): {', '.join(invalid_files)}"
-        return jsonify({"message": msg})
+        return jsonify(
+            {
+                "message": msg,
+                "inserted": stats["inserted"],
+                "duplicates": stats["duplicates"],
+                "invalid": stats["invalid"],
+            }
+        )
     except Exception:
         return jsonify({"error": "Failed to store dataset. MongoDB may be unavailable."}), 503
 
@@ -3,7 +3,9 @@ from hashlib import sha256
 from flask import Blueprint, jsonify, render_template, request
 from flask_jwt_extended import create_access_token
 from ..extensions import bcrypt, db, limiter
-from ..models.user_model import LoginLog, PasswordResetToken, User
+from ..models.user_model import PasswordResetToken, User
+from ..services.auth_cache import token_claims
+from ..services.auth_maintenance import record_login
 from ..services.email_service import generate_reset_token, send_password_reset_email
 from ..utils.security import get_client_ip
 
@@ -53,20 +55,11 @@ def login():
     user = User.query.filter_by(email=email).first()
 
     if user and bcrypt.check_password_hash(user.password, password):
-        token = create_access_token(identity=str(user.id))
-        db.session.add(
-            LoginLog(
-                user_id=user.id,
-                email=email,
-                success=True,
-                ip_address=get_client_ip(),
-            )
-        )
-        db.session.commit()
+        token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
+        record_login(email, True, get_client_ip(), user_id=user.id)
         return jsonify(access_token=token, role=user.role)
 
-    db.session.add(LoginLog(email=email, success=False, ip_address=get_client_ip()))
-    db.session.commit()
+    record_login(email, False, get_client_ip())
     return jsonify({"error": "Invalid credentials"}), 401
 
 
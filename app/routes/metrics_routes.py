@@ -0,0 +1,38 @@
+import hmac
+import time
+from flask import Blueprint, Response, current_app, g, jsonify, request
+from ..extensions import limiter
+from ..services import metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+def register_request_metrics(app):
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.inc(
+            "emotion_http_requests_total",
+            route=route,
+            method=request.method,
+            status=response.status_code,
+        )
+        started = g.get("metrics_started")
+        if started is not None:
+            metrics.observe("emotion_http_request_seconds", time.perf_counter() - started, route=route)
+        return response
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+@limiter.exempt
+def metrics_endpoint():
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, token):
+            return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render_latest(), mimetype="text/plain; version=0.0.4")
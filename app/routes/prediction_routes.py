@@ -1,21 +1,70 @@
-from flask import Blueprint, request, jsonify, render_template
+import math
+import time
+from flask import Blueprint, current_app, g, request, jsonify, render_template
 from flask_jwt_extended import jwt_required
-from ..services.model_service import predict_emotion
-from ..services.ocr_service import extract_text_from_image
-from ..utils.security import sanitize_text, allowed_text_file, allowed_image_file
+from ..services import quota_service
+from ..services.model_service import EMOTION_LABELS, predict_emotion
+from ..services.ocr_service import extract_text_from_image, extract_texts_from_images
+from ..services.profiling_service import profiled
+from ..utils.responses import prediction_format, prediction_response
+from ..utils.security import current_principal, sanitize_text, allowed_text_file, allowed_image_file
 
 prediction_bp = Blueprint("prediction", __name__, url_prefix="/predict")
 
 
+def _charge_quota(cost, allow_debt=False):
+    # Returns a 429 response when the caller's bucket can't cover the cost.
+    # Work that has already been admitted is charged with allow_debt so a
+    # request is never refused halfway through. Deleted or deactivated users
+    # are refused here too, so a still-valid token can't keep spending.
+    principal = current_principal()
+    if not principal or not principal["active"]:
+        return jsonify({"error": "Unauthorized"}), 403
+    if not quota_service.enabled() or cost <= 0:
+        return None
+    allowed, remaining, retry_after = quota_service.consume(f"user:{principal['user_id']}", cost, allow_debt)
+    charged = g.get("quota_charged", 0.0) + (cost if allowed else 0.0)
+    g.quota_charged = charged
+    g.quota = {"cost": charged, "remaining": remaining, "retry_after": retry_after}
+    if allowed:
+        return None
+    return jsonify(
+        {"error": "Prediction quota exceeded. Try again later.", "retry_after": math.ceil(retry_after)}
+    ), 429
+
+
+@prediction_bp.after_request
+def _quota_headers(response):
+    quota = g.get("quota")
+    if quota:
+        response.headers["X-Quota-Limit"] = f"{quota_service.capacity():g}"
+        response.headers["X-Quota-Cost"] = f"{quota['cost']:g}"
+        if quota["remaining"] is not None:
+            response.headers["X-Quota-Remaining"] = f"{max(quota['remaining'], 0.0):.2f}"
+        if response.status_code == 429:
+            response.headers["Retry-After"] = str(math.ceil(quota["retry_after"]))
+    return response
+
+
 @prediction_bp.route("/", methods=["GET"])
 def predict_page():
     return render_template("predict.html")
 
 
+@prediction_bp.route("/labels", methods=["GET"])
+def labels():
+    return jsonify({"labels": EMOTION_LABELS})
+
+
 @prediction_bp.route("/", methods=["POST"])
 @jwt_required()
+@profiled("predict")
 def predict():
+    options, err = prediction_format()
+    if err:
+        return err
     text = None
+    images = 0
     if request.is_json:
         data = request.get_json()
         text = sanitize_text(data.get("text", ""))
@@ -25,6 +74,10 @@ def predict():
             text = f.read().decode("utf-8", errors="ignore")
             text = sanitize_text(text)
         elif f and allowed_image_file(f.filename):
+            images = 1
+            denied = _charge_quota(quota_service.request_cost(0, images=images))
+            if denied:
+                return denied
             extracted, err = extract_text_from_image(f)
             if err:
                 return jsonify({"error": err}), 400
@@ -39,12 +92,88 @@ def predict():
         text = sanitize_text(request.form.get("text", ""))
     if not text:
         return jsonify({"error": "Empty input"}), 400
+    # Image uploads already paid for OCR; the top-up for long text can't be refused.
+    denied = _charge_quota(
+        quota_service.request_cost(len(text), images=images) - g.get("quota_charged", 0.0),
+        allow_debt=images > 0,
+    )
+    if denied:
+        return denied
     emotion, confidence = predict_emotion(text)
-    return jsonify(
+    return prediction_response(
         {
             "predicted_emotion": emotion,
-            "confidence_scores": confidence,
             "chars": len(text),
             "long_text_mode": len(text) > 900,
-        }
+        },
+        confidence,
+        options,
+    )
+
+
+@prediction_bp.route("/images", methods=["POST"])
+@jwt_required()
+@profiled("predict_images")
+def predict_images():
+    options, err = prediction_format()
+    if err:
+        return err
+    files = [f for f in request.files.getlist("files") + request.files.getlist("file") if f and f.filename]
+    if not files:
+        return jsonify({"error": "Upload one or more images as 'files'"}), 400
+    max_images = current_app.config.get("PREDICT_MAX_IMAGES", 10)
+    if len(files) > max_images:
+        return jsonify({"error": f"At most {max_images} images per request"}), 400
+    unsupported = [f.filename for f in files if not allowed_image_file(f.filename)]
+    if unsupported:
+        return jsonify(
+            {"error": "Unsupported file type. Use image files (.png/.jpg/.jpeg/.webp)", "files": unsupported}
+        ), 400
+
+    denied = _charge_quota(quota_service.request_cost(0, images=len(files)))
+    if denied:
+        return denied
+
+    started = time.perf_counter()
+    results = extract_texts_from_images(files)
+    ocr_ms = (time.perf_counter() - started) * 1000.0
+
+    images = []
+    texts = []
+    for f, result in zip(files, results):
+        text = sanitize_text(result["text"] or "")
+        if text:
+            texts.append(text)
+        images.append(
+            {
+                "filename": f.filename,
+                "chars": len(text),
+                "cached": result["cached"],
+                "ocr_ms": round(result["seconds"] * 1000.0, 1),
+                "error": result["error"],
+            }
+        )
+    if not texts:
+        return jsonify({"error": "No readable text found in images.", "images": images}), 400
+
+    # Each image's text is chunked on its own, so no chunk spans two images.
+    merged = "\n".join(texts)
+    chunks = min(sum(quota_service.estimate_chunks(len(t), long_text=True) for t in texts), 120)
+    _charge_quota(
+        quota_service.request_cost(len(merged), images=len(files), chunks=chunks) - g.get("quota_charged", 0.0),
+        allow_debt=True,
+    )
+    started = time.perf_counter()
+    emotion, confidence = predict_emotion(merged, segments=texts)
+    predict_ms = (time.perf_counter() - started) * 1000.0
+    return prediction_response(
+        {
+            "predicted_emotion": emotion,
+            "chars": len(merged),
+            "long_text_mode": True,
+            "images": images,
+            "timings_ms": {"ocr": round(ocr_ms, 1), "predict": round(predict_ms, 1)},
+        },
+        confidence,
+        options,
     )
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from ..extensions import mongo
+
+GRANULARITIES = ("minute", "hour", "day")
+# Minute buckets are only useful for recent activity; hour/day buckets are kept.
+MINUTE_BUCKET_RETENTION = timedelta(days=7)
+MAX_BUCKETS = 2000
+
+
+def bucket_start(ts, granularity):
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_step(granularity):
+    return {"minute": timedelta(minutes=1), "hour": timedelta(hours=1)}.get(
+        granularity, timedelta(days=1)
+    )
+
+
+def record_prediction(label, model_version, ts=None):
+    ts = ts or datetime.utcnow()
+    ops = []
+    for granularity in GRANULARITIES:
+        start = bucket_start(ts, granularity)
+        update = {"$inc": {"count": 1}}
+        if granularity == "minute":
+            update["$setOnInsert"] = {"expire_at": start + MINUTE_BUCKET_RETENTION}
+        ops.append(
+            UpdateOne(
+                {
+                    "granularity": granularity,
+                    "bucket": start,
+                    "label": label,
+                    "model_version": model_version,
+                },
+                update,
+                upsert=True,
+            )
+        )
+    try:
+        mongo.db.prediction_rollups.bulk_write(ops, ordered=False)
+    except Exception:
+        pass
+
+
+def query_rollups(granularity, since, until=None, model_version=None):
+    until = until or datetime.utcnow()
+    query = {
+        "granularity": granularity,
+        "bucket": {"$gte": bucket_start(since, granularity), "$lte": until},
+    }
+    if model_version:
+        query["model_version"] = model_version
+
+    series = {}
+    projection = {"_id": 0, "bucket": 1, "label": 1, "model_version": 1, "count": 1}
+    for doc in mongo.db.prediction_rollups.find(query, projection):
+        entry = series.setdefault(
+            doc["bucket"], {"total": 0, "by_label": {}, "by_model_version": {}}
+        )
+        count = doc.get("count", 0)
+        label = doc.get("label")
+        version = doc.get("model_version") or "unknown"
+        entry["total"] += count
+        entry["by_label"][label] = entry["by_label"].get(label, 0) + count
+        entry["by_model_version"][version] = entry["by_model_version"].get(version, 0) + count
+
+    buckets = []
+    for start in sorted(series):
+        entry = series[start]
+        crisis = entry["by_label"].get("Crisis", 0)
+        entry["crisis_rate"] = crisis / entry["total"] if entry["total"] else 0.0
+        entry["bucket"] = start.isoformat()
+        buckets.append(entry)
+    return buckets
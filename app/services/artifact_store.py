@@ -0,0 +1,155 @@
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import datetime
+import joblib
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+ML_DIR = os.path.join(BASE_DIR, "ml")
+ARTIFACT_KEYS = ("model_path", "vectorizer_path", "compact_model_path", "compact_vectorizer_path")
+LEGACY_VERSION_RE = re.compile(r"^(?:emotion_model|vectorizer)_(\d{14})(?:\.compact)?\.pkl$")
+
+
+def _blob_dir():
+    return os.path.join(ML_DIR, "blobs")
+
+
+def _version_dir():
+    return os.path.join(ML_DIR, "versions")
+
+
+def _pointer_path():
+    return os.path.join(ML_DIR, "current.json")
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def put_object(obj):
+    buf = io.BytesIO()
+    joblib.dump(obj, buf)
+    data = buf.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(_blob_dir(), f"{digest}.pkl")
+    # Identical artifacts map to the same blob, so repeated saves skip the write.
+    if not os.path.exists(path):
+        _atomic_write(path, data)
+    return path
+
+
+def write_version(version, artifacts, **extra):
+    record = {"version": version, "created_at": datetime.utcnow().isoformat()}
+    record.update({k: v for k, v in artifacts.items() if k in ARTIFACT_KEYS and v})
+    record.update(extra)
+    path = os.path.join(_version_dir(), f"{version}.json")
+    _atomic_write(path, json.dumps(record, indent=2).encode("utf-8"))
+    return record
+
+
+def read_version(version):
+    try:
+        with open(os.path.join(_version_dir(), f"{version}.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def list_versions():
+    try:
+        names = os.listdir(_version_dir())
+    except OSError:
+        return []
+    return sorted(n[:-5] for n in names if n.endswith(".json"))
+
+
+def set_current(version):
+    record = read_version(version)
+    if not record:
+        raise ValueError(f"Unknown artifact version: {version}")
+    # os.replace swaps the pointer in one step; readers see the old or the new record.
+    _atomic_write(_pointer_path(), json.dumps(record, indent=2).encode("utf-8"))
+    return record
+
+
+def read_current():
+    try:
+        with open(_pointer_path(), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _legacy_versions():
+    found = {}
+    try:
+        names = os.listdir(ML_DIR)
+    except OSError:
+        return found
+    for name in names:
+        match = LEGACY_VERSION_RE.match(name)
+        if match:
+            found.setdefault(match.group(1), []).append(os.path.join(ML_DIR, name))
+    return found
+
+
+def collect_garbage(retain=5, protected_versions=(), dry_run=False):
+    legacy = _legacy_versions()
+    versions = sorted(set(list_versions()) | set(legacy), reverse=True)
+
+    keep = set(versions[: max(retain, 0)])
+    keep.update(v for v in protected_versions if v)
+    current = read_current()
+    if current:
+        keep.add(current.get("version"))
+
+    pruned_versions = [v for v in versions if v not in keep]
+    removed_files = []
+    for version in pruned_versions:
+        record_path = os.path.join(_version_dir(), f"{version}.json")
+        for path in legacy.get(version, []) + [record_path]:
+            if os.path.exists(path):
+                removed_files.append(path)
+
+    referenced = set()
+    for record in [read_version(v) for v in versions if v in keep] + [current]:
+        for key in ARTIFACT_KEYS:
+            if record and record.get(key):
+                referenced.add(os.path.abspath(record[key]))
+    try:
+        blob_names = os.listdir(_blob_dir())
+    except OSError:
+        blob_names = []
+    for name in blob_names:
+        path = os.path.join(_blob_dir(), name)
+        if name.endswith(".pkl") and os.path.abspath(path) not in referenced:
+            removed_files.append(path)
+
+    freed = 0
+    for path in removed_files:
+        freed += os.path.getsize(path)
+        if not dry_run:
+            os.remove(path)
+
+    return {
+        "kept_versions": sorted(keep & set(versions)),
+        "pruned_versions": pruned_versions,
+        "removed_files": len(removed_files),
+        "freed_bytes": freed,
+        "dry_run": dry_run,
+    }
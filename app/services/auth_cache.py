@@ -0,0 +1,54 @@
+import threading
+import time
+from sqlalchemy import event
+from ..extensions import db
+from ..models.user_model import User
+
+_config = {"ttl": 30.0, "max_entries": 10000}
+_lock = threading.Lock()
+_entries = {}
+
+
+def configure(ttl_seconds=30.0, max_entries=10000):
+    _config["ttl"] = float(ttl_seconds)
+    _config["max_entries"] = int(max_entries)
+    invalidate()
+
+
+def token_claims(user):
+    return {"role": user.role or "user", "active": bool(user.active)}
+
+
+def invalidate(user_id=None):
+    with _lock:
+        if user_id is None:
+            _entries.clear()
+        else:
+            _entries.pop(int(user_id), None)
+
+
+def user_status(user_id):
+    # Current role/active flag for a user, read from SQLite at most once per
+    # TTL per process. None means the user no longer exists.
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(user_id)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    user = db.session.get(User, user_id)
+    status = token_claims(user) if user else None
+    with _lock:
+        if len(_entries) >= _config["max_entries"]:
+            for key in [k for k, (expires, _) in _entries.items() if expires <= now] or list(_entries)[:1]:
+                _entries.pop(key, None)
+        _entries[user_id] = (now + _config["ttl"], status)
+    return status
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_changed_user(mapper, connection, target):
+    # Covers every ORM write in this process; other workers catch up within the TTL.
+    if target.id is not None:
+        invalidate(target.id)
@@ -0,0 +1,151 @@
+import atexit
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, or_
+from ..extensions import db
+from ..models.user_model import LoginLog, OutboundEmail, PasswordResetToken
+
+_config = {
+    "batch_size": 50,
+    "flush_seconds": 1.0,
+    "login_log_days": 90,
+    "reset_token_days": 1,
+    "outbound_email_days": 7,
+    "retention_seconds": 3600.0,
+}
+_lock = threading.Lock()
+_pending = []
+_wakeup = threading.Event()
+_state = {"pid": None, "app": None}
+PRUNE_CHUNK = 1000
+MAX_PENDING = 10000
+
+
+def configure(batch_size=50, flush_seconds=1.0, login_log_days=90, reset_token_days=1,
+              outbound_email_days=7, retention_seconds=3600.0):
+    _config.update(
+        batch_size=max(int(batch_size), 1),
+        flush_seconds=float(flush_seconds),
+        login_log_days=float(login_log_days),
+        reset_token_days=float(reset_token_days),
+        outbound_email_days=float(outbound_email_days),
+        retention_seconds=float(retention_seconds),
+    )
+
+
+def record_login(email, success, ip_address, user_id=None):
+    # Buffered and written in one transaction per batch, so a login costs no
+    # SQLite write lock of its own.
+    row = {
+        "user_id": user_id,
+        "email": email,
+        "success": bool(success),
+        "ip_address": ip_address,
+        "timestamp": datetime.utcnow(),
+    }
+    with _lock:
+        _pending.append(row)
+        if len(_pending) > MAX_PENDING:
+            # The database has been unwritable for a while; keep the newest rows.
+            del _pending[: len(_pending) - MAX_PENDING]
+        full = len(_pending) >= _config["batch_size"]
+    if full:
+        _wakeup.set()
+
+
+def flush_login_logs():
+    with _lock:
+        rows = _pending[:]
+        del _pending[:]
+    if not rows:
+        return 0
+    try:
+        db.session.execute(insert(LoginLog), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        with _lock:
+            _pending[:0] = rows
+        raise
+    return len(rows)
+
+
+def _delete_in_chunks(model, condition):
+    # Small chunks keep each write transaction short so logins are not blocked.
+    removed = 0
+    while True:
+        ids = [row.id for row in db.session.query(model.id).filter(condition).limit(PRUNE_CHUNK)]
+        if not ids:
+            return removed
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        removed += len(ids)
+
+
+def prune_auth_data(now=None):
+    now = now or datetime.utcnow()
+    # Rows finished before bodies were cleared on send still hold reset links.
+    OutboundEmail.query.filter(OutboundEmail.status.in_(["sent", "failed"]), OutboundEmail.body != "").update(
+        {"body": ""}, synchronize_session=False
+    )
+    db.session.commit()
+    return {
+        "login_logs": _delete_in_chunks(
+            LoginLog, LoginLog.timestamp < now - timedelta(days=_config["login_log_days"])
+        ),
+        "reset_tokens": _delete_in_chunks(
+            PasswordResetToken,
+            or_(
+                PasswordResetToken.expires_at < now - timedelta(days=_config["reset_token_days"]),
+                PasswordResetToken.used.is_(True),
+            ),
+        ),
+        # Sent reset emails still contain a usable-looking link; don't keep them around.
+        "outbound_emails": _delete_in_chunks(
+            OutboundEmail,
+            OutboundEmail.status.in_(["sent", "failed"])
+            & (OutboundEmail.created_at < now - timedelta(days=_config["outbound_email_days"])),
+        ),
+    }
+
+
+def _flush_at_exit():
+    app = _state["app"]
+    if app is None:
+        return
+    try:
+        with app.app_context():
+            flush_login_logs()
+    except Exception:
+        pass
+
+
+def start_background(app):
+    if _state["pid"] == os.getpid():
+        return
+    _state.update(pid=os.getpid(), app=app)
+
+    def run():
+        # Jitter so several workers don't all prune at the same moment.
+        next_prune = time.monotonic() + random.uniform(0, min(_config["retention_seconds"], 300.0))
+        while True:
+            _wakeup.wait(timeout=_config["flush_seconds"])
+            _wakeup.clear()
+            with app.app_context():
+                try:
+                    flush_login_logs()
+                    if _config["retention_seconds"] > 0 and time.monotonic() >= next_prune:
+                        next_prune = time.monotonic() + _config["retention_seconds"]
+                        removed = prune_auth_data()
+                        if any(removed.values()):
+                            app.logger.info("Auth data retention removed %s", removed)
+                except Exception as exc:
+                    app.logger.warning("Auth maintenance failed: %s", exc)
+                finally:
+                    db.session.remove()
+
+    atexit.register(_flush_at_exit)
+    threading.Thread(target=run, name="auth-maintenance", daemon=True).start()
@@ -0,0 +1,85 @@
+import copy
+import os
+import sys
+import time
+from . import metrics
+from .compaction_service import restore_serving_dtype
+from .metrics import percentile
+from .model_service import predict_emotion
+
+
+def estimate_memory_bytes(obj, _seen=None):
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if hasattr(obj, "indptr") and hasattr(obj, "data"):
+        return sum(estimate_memory_bytes(getattr(obj, a), _seen) for a in ("data", "indices", "indptr"))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += estimate_memory_bytes(k, _seen) + estimate_memory_bytes(v, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_memory_bytes(item, _seen)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += estimate_memory_bytes(vars(obj), _seen)
+    return size
+
+
+def benchmark_model(model, vectorizer, texts, model_path=None, vectorizer_path=None, warmup=5):
+    texts = [t for t in texts if t]
+    # Synthetic predictions stay out of the serving latency histograms.
+    with metrics.suppressed():
+        for text in texts[:warmup]:
+            predict_emotion(text, model, vectorizer, log_prediction=False)
+
+        latencies = []
+        started = time.perf_counter()
+        for text in texts:
+            t0 = time.perf_counter()
+            predict_emotion(text, model, vectorizer, log_prediction=False)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    artifact_bytes = 0
+    for path in (model_path, vectorizer_path):
+        if path and os.path.exists(path):
+            artifact_bytes += os.path.getsize(path)
+
+    return {
+        "samples": len(latencies),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        },
+        "throughput_per_sec": (len(latencies) / elapsed) if elapsed > 0 else 0.0,
+        "artifact_bytes": artifact_bytes,
+        "memory_bytes": estimate_memory_bytes(model) + estimate_memory_bytes(vectorizer),
+        "n_features": len(getattr(vectorizer, "vocabulary_", {}) or {}),
+    }
+
+
+def prediction_agreement(model, vectorizer, other_model, other_vectorizer, texts):
+    texts = [t for t in texts if t]
+    if not texts:
+        return 1.0
+    other_model, other_vectorizer = restore_serving_dtype(
+        copy.deepcopy(other_model), copy.deepcopy(other_vectorizer)
+    )
+    same = 0
+    with metrics.suppressed():
+        for text in texts:
+            pred, _ = predict_emotion(text, model, vectorizer, log_prediction=False)
+            other_pred, _ = predict_emotion(text, other_model, other_vectorizer, log_prediction=False)
+            if pred == other_pred:
+                same += 1
+    return same / len(texts)
@@ -0,0 +1,49 @@
+import copy
+import numpy as np
+
+SUPPORTED_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def compact_model(model, vectorizer, coef_threshold=0.01, dtype="float32"):
+    target = SUPPORTED_DTYPES.get(dtype, np.float32)
+    coef = np.asarray(model.coef_)
+    # Keep a vocabulary entry only if at least one class gives it real weight.
+    keep = np.flatnonzero(np.abs(coef).max(axis=0) > coef_threshold)
+    if keep.size == 0:
+        keep = np.arange(coef.shape[1])
+
+    terms_by_index = [None] * coef.shape[1]
+    for term, idx in vectorizer.vocabulary_.items():
+        terms_by_index[idx] = term
+
+    small_vectorizer = copy.deepcopy(vectorizer)
+    small_vectorizer.vocabulary_ = {terms_by_index[old]: new for new, old in enumerate(keep)}
+    small_vectorizer.idf_ = np.asarray(vectorizer.idf_)[keep].astype(target)
+    small_vectorizer._tfidf.n_features_in_ = int(keep.size)
+    # Emit float32 rows so scoring does not upcast the coefficient matrix per call.
+    small_vectorizer.dtype = np.float32
+
+    small_model = copy.deepcopy(model)
+    small_model.coef_ = np.ascontiguousarray(coef[:, keep].astype(target))
+    small_model.intercept_ = np.asarray(model.intercept_).astype(target)
+    small_model.n_features_in_ = int(keep.size)
+
+    stats = {
+        "features_before": int(coef.shape[1]),
+        "features_after": int(keep.size),
+        "coef_threshold": coef_threshold,
+        "dtype": dtype if dtype in SUPPORTED_DTYPES else "float32",
+    }
+    return small_model, small_vectorizer, stats
+
+
+def restore_serving_dtype(model, vectorizer):
+    # float16 only shrinks artifacts on disk; BLAS and scipy have no half
+    # precision kernels, so score in float32.
+    if getattr(getattr(model, "coef_", None), "dtype", None) == np.float16:
+        model.coef_ = model.coef_.astype(np.float32)
+        model.intercept_ = model.intercept_.astype(np.float32)
+    idf = getattr(vectorizer, "idf_", None)
+    if getattr(idf, "dtype", None) == np.float16:
+        vectorizer.idf_ = idf.astype(np.float32)
+    return model, vectorizer
@@ -0,0 +1,158 @@
+import csv
+import hashlib
+import io
+import os
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from .index_service import ensure_collection_indexes
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _normalize_key(key):
+    return str(key or "").replace("\ufeff", "").strip().strip('"').strip("'").lower()
+
+
+def content_hash(text, label):
+    return hashlib.sha1(f"{text}\x1f{label}".encode("utf-8")).hexdigest()
+
+
+def open_text_stream(binary_stream):
+    return io.TextIOWrapper(binary_stream, encoding="utf-8", errors="ignore", newline="")
+
+
+def iter_csv_records(text_stream, default_label=""):
+    reader = csv.reader(text_stream)
+    header = next(reader, None)
+    if not header:
+        return
+    # Resolve column positions once per file instead of once per cell.
+    keys = [_normalize_key(h) for h in header]
+    text_idx = keys.index("text") if "text" in keys else None
+    label_idx = keys.index("label") if "label" in keys else None
+    for row in reader:
+        text = row[text_idx].strip() if text_idx is not None and text_idx < len(row) else ""
+        label = row[label_idx].strip() if label_idx is not None and label_idx < len(row) else ""
+        yield text, label or default_label
+
+
+def _dedupe_batch(batch):
+    unique = {}
+    for doc in batch:
+        unique.setdefault(doc["content_hash"], doc)
+    return list(unique.values())
+
+
+def _insert_batch(collection, batch, stats):
+    docs = _dedupe_batch(batch)
+    stats["duplicates"] += len(batch) - len(docs)
+    existing = {
+        d["content_hash"]
+        for d in collection.find(
+            {"content_hash": {"$in": [d["content_hash"] for d in docs]}},
+            {"content_hash": 1, "_id": 0},
+        )
+    }
+    docs = [d for d in docs if d["content_hash"] not in existing]
+    stats["duplicates"] += len(existing)
+    if not docs:
+        return
+    try:
+        result = collection.insert_many(docs, ordered=False)
+        stats["inserted"] += len(result.inserted_ids)
+    except BulkWriteError as exc:
+        # A concurrent upload may have inserted the same rows; the unique index rejects them.
+        errors = exc.details.get("writeErrors", [])
+        if any(e.get("code") != DUPLICATE_KEY_ERROR for e in errors):
+            raise
+        stats["inserted"] += exc.details.get("nInserted", 0)
+        stats["duplicates"] += len(errors)
+
+
+def _append_fallback_csv(path, batch, stats):
+    docs = _dedupe_batch(batch)
+    stats["duplicates"] += len(batch) - len(docs)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_header = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=["text", "label"], extrasaction="ignore")
+        if write_header:
+            writer.writeheader()
+        writer.writerows(docs)
+    stats["inserted"] += len(docs)
+
+
+def ingest_records(records, collection, fallback_csv, batch_size=1000, stats=None):
+    if stats is None:
+        stats = {"inserted": 0, "duplicates": 0, "invalid": 0, "fallback": False}
+
+    def flush(batch):
+        if not stats["fallback"]:
+            try:
+                ensure_collection_indexes(collection)
+                _insert_batch(collection, batch, stats)
+                return
+            except BulkWriteError:
+                raise
+            except Exception:
+                stats["fallback"] = True
+        _append_fallback_csv(fallback_csv, batch, stats)
+
+    batch = []
+    for text, label in records:
+        if not text or not label:
+            stats["invalid"] += 1
+            continue
+        batch.append({"text": text, "label": label, "content_hash": content_hash(text, label)})
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return stats
+
+
+def backfill_content_hashes(collection, batch_size=1000):
+    # Rows stored before uploads were hashed have no content_hash, so the
+    # unique index neither covers them nor stops a re-upload duplicating them.
+    # Each gets its hash; a row whose hash is already taken is a duplicate of
+    # that row and is removed, as an upload would have skipped it.
+    ensure_collection_indexes(collection)
+    stats = {"hashed": 0, "duplicates": 0}
+    last_id = None
+    while True:
+        query = {"content_hash": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query, {"text": 1, "label": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return stats
+        last_id = batch[-1]["_id"]
+
+        hashes = {doc["_id"]: content_hash(doc.get("text") or "", doc.get("label") or "") for doc in batch}
+        taken = {
+            d["content_hash"]
+            for d in collection.find(
+                {"content_hash": {"$in": list(set(hashes.values()))}}, {"content_hash": 1, "_id": 0}
+            )
+        }
+        ops = []
+        for doc in batch:
+            digest = hashes[doc["_id"]]
+            if digest in taken:
+                ops.append(DeleteOne({"_id": doc["_id"]}))
+                stats["duplicates"] += 1
+            else:
+                taken.add(digest)
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"content_hash": digest}}))
+                stats["hashed"] += 1
+        try:
+            collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as exc:
+            # A concurrent upload inserted the same row first; drop ours.
+            errors = exc.details.get("writeErrors", [])
+            if any(e.get("code") != DUPLICATE_KEY_ERROR for e in errors):
+                raise
+            collection.bulk_write([DeleteOne({"_id": batch[e["index"]]["_id"]}) for e in errors])
+            stats["hashed"] -= len(errors)
+            stats["duplicates"] += len(errors)
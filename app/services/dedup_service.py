@@ -0,0 +1,82 @@
+import numpy as np
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _permutations(num_perm, seed=1):
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+    b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+    return a, b
+
+
+def _band_layout(num_perm, threshold):
+    # Pick bands * rows == num_perm whose LSH threshold (1/b)^(1/r) sits at or
+    # just below the target, so candidates err towards recall and are then verified.
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def _shingle_hashes(text, size):
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    if data.size < size:
+        data = np.concatenate([data, np.zeros(size - data.size, dtype=np.uint64)])
+    # Pack each run of `size` bytes (size <= 8) into one integer, then mix to 32 bits.
+    packed = np.zeros(data.size - size + 1, dtype=np.uint64)
+    for offset in range(size):
+        packed |= data[offset : offset + packed.size] << np.uint64(8 * offset)
+    return np.unique((packed * _GOLDEN) >> np.uint64(32))
+
+
+def minhash_signature(text, a, b, shingle_size=5):
+    shingles = _shingle_hashes(text, shingle_size)
+    return ((a[:, None] * shingles[None, :] + b[:, None]) % _PRIME).min(axis=1)
+
+
+def find_near_duplicates(texts, labels, threshold=0.8, num_perm=64, shingle_size=5):
+    a, b = _permutations(num_perm)
+    bands, rows = _band_layout(num_perm, threshold)
+    buckets = {}
+    keep = []
+    removed_by_label = {}
+
+    for idx, (text, label) in enumerate(zip(texts, labels)):
+        sig = minhash_signature(text, a, b, shingle_size)
+        keys = [(label, band, sig[band * rows : (band + 1) * rows].tobytes()) for band in range(bands)]
+
+        # Compare against one representative per bucket, so work stays linear
+        # even when many rows share a template.
+        duplicate = False
+        checked = set()
+        for key in keys:
+            rep = buckets.get(key)
+            if rep is None or rep[0] in checked:
+                continue
+            checked.add(rep[0])
+            if np.mean(rep[1] == sig) >= threshold:
+                duplicate = True
+                break
+
+        if duplicate:
+            removed_by_label[label] = removed_by_label.get(label, 0) + 1
+            continue
+        keep.append(idx)
+        for key in keys:
+            buckets.setdefault(key, (idx, sig))
+
+    stats = {
+        "threshold": threshold,
+        "num_perm": num_perm,
+        "bands": bands,
+        "rows_per_band": rows,
+        "removed": len(texts) - len(keep),
+        "removed_by_label": removed_by_label,
+    }
+    return keep, stats
@@ -1,9 +1,9 @@
 import hashlib
 from datetime import datetime, timedelta
 from flask import url_for
-from ..extensions import mail, db
+from ..extensions import db
 from ..models.user_model import PasswordResetToken
-from flask_mail import Message
+from .mail_queue import enqueue_email
 import secrets
 
 RESET_TOKEN_MINUTES = 30
@@ -21,13 +21,9 @@ def generate_reset_token(user_id):
 
 def send_password_reset_email(user, raw_token):
     reset_link = url_for('auth.reset_password', token=raw_token, _external=True)
-    msg = Message(
+    # Queued and sent by the background dispatcher so the request never waits on SMTP.
+    enqueue_email(
+        recipient=user.email,
         subject='Password Reset Request',
-        recipients=[user.email],
         body=f"Hello,\n\nClick the link below to reset your password (valid for {RESET_TOKEN_MINUTES} minutes):\n{reset_link}\n\nIf you did not request this, please ignore this email."
     )
-    try:
-        mail.send(msg)
-    except Exception as e:
-        # Fallback: log the link to console when SMTP is not configured
-        print(f"[WARN] Failed to send email: {e}. Reset link: {reset_link}")
@@ -0,0 +1,75 @@
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+MONGO_INDEXES = {
+    "models": [
+        ([("status", ASCENDING)], {}),
+        ([("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "predictions": [
+        ([("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("model_version", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "prediction_rollups": [
+        (
+            [
+                ("granularity", ASCENDING),
+                ("bucket", ASCENDING),
+                ("label", ASCENDING),
+                ("model_version", ASCENDING),
+            ],
+            {"unique": True},
+        ),
+        ([("expire_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "datasets": [
+        (
+            [("content_hash", ASCENDING)],
+            {"unique": True, "partialFilterExpression": {"content_hash": {"$exists": True}}},
+        ),
+    ],
+}
+
+PREDICTION_TTL_INDEX = "created_at_ttl"
+
+_ensured = set()
+
+
+def ensure_collection_indexes(collection):
+    if collection.name in _ensured:
+        return
+    for keys, options in MONGO_INDEXES.get(collection.name, []):
+        collection.create_index(keys, **options)
+    _ensured.add(collection.name)
+
+
+def ensure_prediction_ttl(collection, ttl_days):
+    existing = collection.index_information().get(PREDICTION_TTL_INDEX)
+    if not ttl_days:
+        if existing:
+            collection.drop_index(PREDICTION_TTL_INDEX)
+        return
+    seconds = int(ttl_days * 86400)
+    if existing is None:
+        collection.create_index(
+            [("created_at", ASCENDING)], name=PREDICTION_TTL_INDEX, expireAfterSeconds=seconds
+        )
+    elif existing.get("expireAfterSeconds") != seconds:
+        try:
+            # collMod changes the expiry in place instead of rebuilding the index.
+            collection.database.command(
+                "collMod",
+                collection.name,
+                index={"name": PREDICTION_TTL_INDEX, "expireAfterSeconds": seconds},
+            )
+        except OperationFailure:
+            collection.drop_index(PREDICTION_TTL_INDEX)
+            collection.create_index(
+                [("created_at", ASCENDING)], name=PREDICTION_TTL_INDEX, expireAfterSeconds=seconds
+            )
+
+
+def ensure_mongo_indexes(db, prediction_ttl_days=0):
+    for name in MONGO_INDEXES:
+        ensure_collection_indexes(db[name])
+    ensure_prediction_ttl(db.predictions, prediction_ttl_days)
@@ -0,0 +1,53 @@
+EMOTION_LABELS = [
+    "Admiration",
+    "Amusement",
+    "Anger",
+    "Annoyance",
+    "Approval",
+    "Caring",
+    "Confusion",
+    "Curiosity",
+    "Desire",
+    "Disappointment",
+    "Disapproval",
+    "Disgust",
+    "Embarrassment",
+    "Excitement",
+    "Fear",
+    "Gratitude",
+    "Grief",
+    "Joy",
+    "Love",
+    "Nervousness",
+    "Optimism",
+    "Pride",
+    "Realization",
+    "Relief",
+    "Remorse",
+    "Sadness",
+    "Surprise",
+    "Neutral",
+    "Crisis",
+]
+
+LEGACY_TO_EXPANDED = {
+    "Happy": "Joy",
+    "Sad": "Sadness",
+    "Angry": "Anger",
+    "Fear": "Fear",
+    "Neutral": "Neutral",
+}
+
+_INDEX = {label: i for i, label in enumerate(EMOTION_LABELS)}
+
+
+def canonical_scores(probs, classes):
+    # Re-keys probabilities that follow `classes` (a model's classes_, which
+    # sklearn sorts alphabetically) onto EMOTION_LABELS by name. Legacy labels
+    # fold into their expanded label; classes we don't know are dropped.
+    scores = [0.0] * len(EMOTION_LABELS)
+    for label, p in zip(classes, probs):
+        i = _INDEX.get(LEGACY_TO_EXPANDED.get(label, label))
+        if i is not None:
+            scores[i] += float(p)
+    return scores
@@ -0,0 +1,157 @@
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask_mail import Message
+from sqlalchemy import and_, or_
+from ..extensions import db, mail
+from ..models.user_model import OutboundEmail
+from . import metrics
+
+_config = {
+    "batch_size": 20,
+    "max_attempts": 5,
+    "retry_base": 30.0,
+    "retry_max": 3600.0,
+    "poll": 5.0,
+    "stale": 600.0,
+}
+_wakeup = threading.Event()
+_state = {"pid": None}
+
+
+def configure(batch_size=20, max_attempts=5, retry_base_seconds=30.0, retry_max_seconds=3600.0,
+              poll_seconds=5.0, stale_claim_seconds=600.0):
+    _config.update(
+        batch_size=max(int(batch_size), 1),
+        max_attempts=max(int(max_attempts), 1),
+        retry_base=float(retry_base_seconds),
+        retry_max=float(retry_max_seconds),
+        poll=float(poll_seconds),
+        stale=float(stale_claim_seconds),
+    )
+
+
+def enqueue_email(recipient, subject, body):
+    db.session.add(OutboundEmail(recipient=recipient, subject=subject, body=body))
+    db.session.commit()
+    _wakeup.set()
+
+
+def _due_filter(now):
+    # Pending mail that is due, plus claims left behind by a worker that died mid-send.
+    return or_(
+        and_(OutboundEmail.status == "pending", OutboundEmail.next_attempt_at <= now),
+        and_(OutboundEmail.status == "sending", OutboundEmail.claimed_at < now - timedelta(seconds=_config["stale"])),
+    )
+
+
+def _claim_batch():
+    now = datetime.utcnow()
+    ids = [
+        row.id
+        for row in db.session.query(OutboundEmail.id)
+        .filter(_due_filter(now))
+        .order_by(OutboundEmail.id)
+        .limit(_config["batch_size"])
+    ]
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Re-checking the due filter in the UPDATE makes the claim atomic across workers.
+    OutboundEmail.query.filter(OutboundEmail.id.in_(ids), _due_filter(now)).update(
+        {"status": "sending", "claim_token": token, "claimed_at": now}, synchronize_session=False
+    )
+    db.session.commit()
+    return OutboundEmail.query.filter_by(claim_token=token).order_by(OutboundEmail.id).all()
+
+
+def _finish(entry, status):
+    # Bodies carry live reset links; keep them only while a send is still pending.
+    entry.status = status
+    entry.body = ""
+
+
+def _record_failure(entry, exc, logger):
+    entry.attempts += 1
+    entry.last_error = str(exc)[:500]
+    if entry.attempts >= _config["max_attempts"]:
+        _finish(entry, "failed")
+        metrics.inc("emotion_mail_total", result="failed")
+        logger.warning("Giving up on email %s to %s: %s", entry.id, entry.recipient, exc)
+        return
+    entry.status = "pending"
+    delay = min(_config["retry_base"] * 2 ** (entry.attempts - 1), _config["retry_max"])
+    entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    metrics.inc("emotion_mail_total", result="retry")
+    logger.warning("Failed to send email %s (attempt %s), retrying in %ss: %s", entry.id, entry.attempts, int(delay), exc)
+
+
+def _close(connection):
+    try:
+        connection.__exit__(None, None, None)
+    except Exception:
+        pass
+
+
+def dispatch_pending(logger):
+    # Drains everything due over a single SMTP session; a connection that
+    # errors is dropped and reopened for the next message.
+    sent = 0
+    connection = None
+    try:
+        while True:
+            batch = _claim_batch()
+            if not batch:
+                break
+            for index, entry in enumerate(batch):
+                if connection is None:
+                    try:
+                        connection = mail.connect()
+                        connection.__enter__()
+                    except Exception as exc:
+                        # Relay unreachable: reschedule the rest instead of
+                        # paying the connect timeout once per message.
+                        for pending in batch[index:]:
+                            _record_failure(pending, exc, logger)
+                        db.session.commit()
+                        return sent
+                try:
+                    connection.send(Message(subject=entry.subject, recipients=[entry.recipient], body=entry.body))
+                except Exception as exc:
+                    _close(connection)
+                    connection = None
+                    _record_failure(entry, exc, logger)
+                    continue
+                entry.attempts += 1
+                _finish(entry, "sent")
+                entry.sent_at = datetime.utcnow()
+                entry.last_error = None
+                sent += 1
+                metrics.inc("emotion_mail_total", result="sent")
+            db.session.commit()
+    finally:
+        if connection is not None:
+            _close(connection)
+    return sent
+
+
+def start_dispatcher(app):
+    if _state["pid"] == os.getpid():
+        return
+    _state["pid"] = os.getpid()
+
+    def run():
+        while True:
+            _wakeup.wait(timeout=_config["poll"])
+            _wakeup.clear()
+            with app.app_context():
+                try:
+                    dispatch_pending(app.logger)
+                except Exception as exc:
+                    app.logger.warning("Mail dispatch failed: %s", exc)
+                finally:
+                    db.session.remove()
+
+    _wakeup.set()  # pick up anything queued before this worker started
+    threading.Thread(target=run, name="mail-dispatcher", daemon=True).start()
@@ -0,0 +1,377 @@
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited workers' files are kept and read as-is
+    fcntl = None
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CHUNK_BUCKETS = (1, 2, 5, 10, 20, 50, 80, 120)
+
+METRIC_HELP = {
+    "emotion_stage_seconds": ("histogram", "Time spent in each prediction pipeline stage."),
+    "emotion_http_requests_total": ("counter", "HTTP requests by route, method and status."),
+    "emotion_http_request_seconds": ("histogram", "HTTP request latency by route."),
+    "emotion_long_text_chunks": ("histogram", "Chunks scored per long-text prediction."),
+    "emotion_model_info": ("gauge", "Model version loaded by a worker (value is always 1)."),
+    "emotion_model_fallback": ("gauge", "1 when a worker serves the keyword fallback."),
+    "emotion_ocr_cache_total": ("counter", "OCR lookups by cache result."),
+    "emotion_ocr_cache_entries": ("gauge", "Extracted texts held in the OCR cache."),
+    "emotion_ocr_in_flight": ("gauge", "OCR jobs running or queued."),
+    "emotion_ocr_rejected_total": ("counter", "OCR requests refused because the queue was full."),
+    "emotion_ocr_timeouts_total": ("counter", "OCR jobs that exceeded the timeout."),
+    "emotion_startup_seconds": ("gauge", "Time spent in each create_app() phase at worker start."),
+    "emotion_mail_total": ("counter", "Queued emails by delivery outcome (sent, retry, failed)."),
+    "emotion_quota_total": ("counter", "Prediction quota checks by result (allowed, denied, error)."),
+}
+
+_lock = threading.Lock()
+_state = {"pid": None}
+_thread = threading.local()
+_gauge_callbacks = []
+_config = {"dir": None, "interval": 5.0}
+AGGREGATE_FILE = "aggregate.json"
+FOLDED_GRACE_SECONDS = 600.0
+
+
+def configure(metrics_dir, flush_interval=5.0):
+    _config["dir"] = metrics_dir
+    _config["interval"] = flush_interval
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        atexit.register(_flush_quietly)
+
+
+@contextmanager
+def suppressed():
+    # Nothing recorded on this thread inside the block counts towards
+    # /metrics, e.g. synthetic predictions run while benchmarking a retrain.
+    previous = getattr(_thread, "suppressed", False)
+    _thread.suppressed = True
+    try:
+        yield
+    finally:
+        _thread.suppressed = previous
+
+
+def _recording():
+    return not getattr(_thread, "suppressed", False)
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list; 0.0 when empty.
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def register_gauge_callback(callback):
+    # callback() -> iterable of (name, labels_dict, value); evaluated at export time.
+    _gauge_callbacks.append(callback)
+
+
+def _local():
+    pid = os.getpid()
+    if _state["pid"] != pid:
+        # First use in this process (or after a fork): never report the parent's numbers.
+        _state.update(
+            pid=pid,
+            token=f"{pid}-{int(time.time() * 1000)}",
+            counters={},
+            histograms={},
+            gauges={},
+            flusher=None,
+        )
+    return _state
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not _recording():
+        return
+    with _lock:
+        counters = _local()["counters"]
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+    _ensure_flusher()
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    if not _recording():
+        return
+    with _lock:
+        histograms = _local()["histograms"]
+        key = _key(name, labels)
+        hist = histograms.get(key)
+        if hist is None:
+            hist = histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+                break
+        hist["sum"] += value
+        hist["count"] += 1
+    _ensure_flusher()
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _local()["gauges"][_key(name, labels)] = value
+
+
+def clear_gauge(name):
+    with _lock:
+        gauges = _local()["gauges"]
+        for key in [k for k in gauges if k[0] == name]:
+            del gauges[key]
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("emotion_stage_seconds", time.perf_counter() - start, stage=stage)
+
+
+def _snapshot():
+    with _lock:
+        state = _local()
+        gauges = dict(state["gauges"])
+        snap = {
+            "counters": [[k[0], list(k[1]), v] for k, v in state["counters"].items()],
+            "histograms": [[k[0], list(k[1]), dict(h, counts=list(h["counts"]))] for k, h in state["histograms"].items()],
+        }
+    for callback in _gauge_callbacks:
+        try:
+            for name, labels, value in callback():
+                gauges[_key(name, labels)] = value
+        except Exception:
+            continue
+    snap["gauges"] = [[k[0], list(k[1]), v] for k, v in gauges.items()]
+    return snap
+
+
+def flush():
+    directory = _config["dir"]
+    if not directory:
+        return
+    data = json.dumps(_snapshot()).encode("utf-8")
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, os.path.join(directory, f"worker-{_local()['token']}.json"))
+
+
+def _flush_quietly():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+def _ensure_flusher():
+    state = _state
+    if not _config["dir"] or state.get("flusher") is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(_config["interval"])
+            _flush_quietly()
+
+    with _lock:
+        if state.get("flusher") is None:
+            state["flusher"] = threading.Thread(target=run, name="metrics-flush", daemon=True)
+            state["flusher"].start()
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots):
+    # Counters and histograms sum across workers; gauges take the max so
+    # a flag raised by any worker (e.g. fallback mode) stays visible.
+    counters, histograms, gauges = {}, {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap.get("counters", []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap.get("histograms", []):
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None or merged["buckets"] != hist["buckets"]:
+                histograms[key] = dict(hist, counts=list(hist["counts"]))
+                continue
+            merged["counts"] = [a + b for a, b in zip(merged["counts"], hist["counts"])]
+            merged["sum"] += hist["sum"]
+            merged["count"] += hist["count"]
+        for name, labels, value in snap.get("gauges", []):
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = max(gauges.get(key, value), value)
+    return counters, histograms, gauges
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _fold_dead_workers(directory, names, stale_before):
+    # Files of workers that stopped flushing and whose process is gone are
+    # summed into one aggregate file and deleted, so worker restarts don't
+    # grow the directory while totals keep counting them. "folded" maps each
+    # file already in the aggregate to when it was folded; readers skip those
+    # names, so an entry outlives the file long enough for any scrape that
+    # read it before deletion to finish.
+    if fcntl is None:
+        return
+    with open(os.path.join(directory, ".fold.lock"), "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return  # another worker is folding right now
+        aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+        aggregate = _read_snapshot(aggregate_path) or {}
+        now = time.time()
+        folded = {
+            name: at
+            for name, at in (aggregate.get("folded") or {}).items()
+            if name in names or at > now - FOLDED_GRACE_SECONDS
+        }
+        dead = {}
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                pid = int(name.split("-")[1])
+                if name in folded or os.path.getmtime(path) >= stale_before or _pid_alive(pid):
+                    continue
+            except (OSError, IndexError, ValueError):
+                continue
+            dead[name] = _read_snapshot(path) or {}
+        if dead:
+            counters, histograms, _ = _merge([aggregate] + list(dead.values()))
+            folded.update((name, now) for name in dead)
+            data = json.dumps(
+                {
+                    "counters": [[k[0], list(k[1]), v] for k, v in counters.items()],
+                    "histograms": [[k[0], list(k[1]), h] for k, h in histograms.items()],
+                    "gauges": [],
+                    "folded": folded,
+                }
+            ).encode("utf-8")
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_path, aggregate_path)
+        for name in folded:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def _collect():
+    own = _local()["token"]
+    snapshots = [_snapshot()]
+    directory = _config["dir"]
+    stale_before = time.time() - max(60.0, 3 * _config["interval"])
+    if directory and os.path.isdir(directory):
+        names = [n for n in os.listdir(directory) if n.startswith("worker-") and n != f"worker-{own}.json"]
+        try:
+            _fold_dead_workers(directory, names, stale_before)
+        except OSError:
+            pass
+        workers = {}
+        for name in os.listdir(directory):
+            if not name.startswith("worker-") or name == f"worker-{own}.json":
+                continue
+            path = os.path.join(directory, name)
+            try:
+                snap = _read_snapshot(path)
+                if snap is None:
+                    continue
+                # Exited workers still count towards totals, but their gauges
+                # (loaded model, fallback flag) no longer describe the fleet.
+                if os.path.getmtime(path) < stale_before:
+                    snap["gauges"] = []
+                workers[name] = snap
+            except OSError:
+                continue
+        # Read last: a file folded while we were listing is either gone or
+        # named in "folded", so it is counted exactly once.
+        aggregate = _read_snapshot(os.path.join(directory, AGGREGATE_FILE))
+        if aggregate:
+            snapshots.append(aggregate)
+            for name in aggregate.get("folded", []):
+                workers.pop(name, None)
+        snapshots.extend(workers.values())
+    return _merge(snapshots)
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + escaped + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_latest():
+    counters, histograms, gauges = _collect()
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append(("c", labels, value))
+    for (name, labels), hist in histograms.items():
+        by_name.setdefault(name, []).append(("h", labels, hist))
+    for (name, labels), value in gauges.items():
+        by_name.setdefault(name, []).append(("g", labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for entry_kind, labels, value in sorted(by_name[name], key=lambda e: e[1]):
+            if entry_kind != "h":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(value["buckets"], value["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(value['sum']))}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,14 @@
 import os
 import re
 import joblib
-from datetime import datetime
-from .nlp_pipeline import preprocess_text
+from flask import current_app
+from .nlp_pipeline import get_nlp, preprocess_text
+from .compaction_service import restore_serving_dtype
+from .serving_vectorizer import compact_vectorizer
+from . import artifact_store, metrics
+from .analytics_service import record_prediction
+from .labels import EMOTION_LABELS, LEGACY_TO_EXPANDED, canonical_scores
+from .prediction_log import build_log_document
 from ..extensions import mongo
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
@@ -12,38 +18,7 @@ _model = None
 _vectorizer = None
 _active_version = None
 _fallback = True
-
-EMOTION_LABELS = [
-    "Admiration",
-    "Amusement",
-    "Anger",
-    "Annoyance",
-    "Approval",
-    "Caring",
-    "Confusion",
-    "Curiosity",
-    "Desire",
-    "Disappointment",
-    "Disapproval",
-    "Disgust",
-    "Embarrassment",
-    "Excitement",
-    "Fear",
-    "Gratitude",
-    "Grief",
-    "Joy",
-    "Love",
-    "Nervousness",
-    "Optimism",
-    "Pride",
-    "Realization",
-    "Relief",
-    "Remorse",
-    "Sadness",
-    "Surprise",
-    "Neutral",
-    "Crisis",
-]
+_version_classes = {}
 
 EMOTION_KEYWORDS = {
     "Admiration": ["admire", "respect", "inspired", "amazing", "impressive"],
@@ -86,14 +61,6 @@ EMOTION_KEYWORDS = {
     ],
 }
 
-LEGACY_TO_EXPANDED = {
-    "Happy": "Joy",
-    "Sad": "Sadness",
-    "Angry": "Anger",
-    "Fear": "Fear",
-    "Neutral": "Neutral",
-}
-
 CONTRAST_CUES = [
     "but",
     "however",
@@ -106,6 +73,12 @@ CONTRAST_CUES = [
 NEGATIVE_BOOST = ["Anger", "Annoyance", "Disapproval", "Disappointment", "Sadness"]
 
 
+def serving_artifact_paths(doc):
+    if doc.get("compact_model_path") and doc.get("compact_vectorizer_path"):
+        return doc["compact_model_path"], doc["compact_vectorizer_path"]
+    return doc.get("model_path"), doc.get("vectorizer_path")
+
+
 def _load_active_model():
     global _model, _vectorizer, _active_version, _fallback
     if _model is not None and _vectorizer is not None:
@@ -116,23 +89,66 @@ def _load_active_model():
         active = models_col.find_one({"status": "active"})
     except Exception:
         active = None
+    current = None if active else artifact_store.read_current()
     if active:
-        model_path = active.get("model_path")
-        vec_path = active.get("vectorizer_path")
+        model_path, vec_path = serving_artifact_paths(active)
         _active_version = active.get("version")
+    elif current:
+        model_path, vec_path = serving_artifact_paths(current)
+        _active_version = current.get("version")
     else:
         model_path = os.path.join(ML_DIR, "emotion_model.pkl")
         vec_path = os.path.join(ML_DIR, "vectorizer.pkl")
         _active_version = "default"
     try:
-        _model = joblib.load(model_path)
-        _vectorizer = joblib.load(vec_path)
+        _model, _vectorizer = restore_serving_dtype(
+            joblib.load(model_path), joblib.load(vec_path)
+        )
+        if current_app.config.get("COMPACT_VECTORIZER_ENABLED", True):
+            _vectorizer = compact_vectorizer(_vectorizer)
         _fallback = False
     except Exception:
         # Fallback to keyword-based classifier if model can't be loaded
         _model = None
         _vectorizer = None
         _fallback = True
+    metrics.clear_gauge("emotion_model_info")
+    metrics.set_gauge("emotion_model_info", 1, version=_active_version)
+    metrics.set_gauge("emotion_model_fallback", 1 if _fallback else 0)
+
+
+def model_classes(version):
+    # classes_ of the model behind a logged model_version, for reading full
+    # prediction logs written before probs were stored in label order. None
+    # when its artifact can no longer be found.
+    if version in _version_classes:
+        return _version_classes[version]
+    if version == _active_version and _model is not None:
+        _version_classes[version] = [str(c) for c in _model.classes_]
+        return _version_classes[version]
+    record = None
+    try:
+        record = mongo.db.models.find_one({"version": version}) if version else None
+    except Exception:
+        record = None
+    record = record or (artifact_store.read_version(version) if version else None)
+    if record:
+        model_path = serving_artifact_paths(record)[0]
+    elif version == "default":
+        model_path = os.path.join(ML_DIR, "emotion_model.pkl")
+    else:
+        model_path = os.path.join(ML_DIR, f"emotion_model_{version}.pkl")
+    try:
+        classes = [str(c) for c in joblib.load(model_path).classes_]
+    except Exception:
+        classes = None
+    _version_classes[version] = classes
+    return classes
+
+
+def warmup():
+    get_nlp()
+    _load_active_model()
 
 
 def _contains_crisis_language(raw_text, clean_text):
@@ -221,25 +237,34 @@ def _fallback_scores(raw_text, clean_text):
     return _apply_context_rules(raw_text, clean_text, scores)
 
 
-def _predict_single(text):
-    _load_active_model()
-    clean = preprocess_text(text)
-    if not _fallback:
-        vec = _vectorizer.transform([clean])
-        model_pred = _model.predict(vec)[0]
-        pred = LEGACY_TO_EXPANDED.get(model_pred, model_pred)
-        probs = []
-        model_conf = 0.0
-        try:
-            probs = _model.predict_proba(vec)[0].tolist()
-            if probs:
-                model_conf = max(probs)
-        except Exception:
+def _predict_single(text, model=None, vectorizer=None, log_prediction=True):
+    if model is None or vectorizer is None:
+        _load_active_model()
+        model, vectorizer = _model, _vectorizer
+    with metrics.timed("preprocess_text"):
+        clean = preprocess_text(text)
+    if model is not None and vectorizer is not None:
+        with metrics.timed("vectorize"):
+            vec = vectorizer.transform([clean])
+        with metrics.timed("model_score"):
+            model_pred = model.predict(vec)[0]
+            pred = LEGACY_TO_EXPANDED.get(model_pred, model_pred)
             probs = []
+            model_conf = 0.0
+            try:
+                # Scores always leave here in EMOTION_LABELS order, whatever
+                # order (and legacy labels) the model's classes_ use.
+                model_probs = model.predict_proba(vec)[0].tolist()
+                if model_probs:
+                    model_conf = max(model_probs)
+                    probs = canonical_scores(model_probs, model.classes_)
+            except Exception:
+                probs = []
 
         # Hybrid behavior: use keyword signal when model is uncertain.
-        fallback_pred, fallback_probs = _predict_fallback(text, clean)
-        fallback_signal = _fallback_scores(text, clean).get(fallback_pred, 0)
+        with metrics.timed("keyword_fallback"):
+            fallback_pred, fallback_probs = _predict_fallback(text, clean)
+            fallback_signal = _fallback_scores(text, clean).get(fallback_pred, 0)
         if fallback_pred == "Crisis":
             pred = "Crisis"
             probs = fallback_probs
@@ -257,17 +282,25 @@ def _predict_single(text):
             pred = "Crisis"
             probs = [1.0 if label == "Crisis" else 0.0 for label in EMOTION_LABELS]
     else:
-        pred, probs = _predict_fallback(text, clean)
+        with metrics.timed("keyword_fallback"):
+            pred, probs = _predict_fallback(text, clean)
+    if not log_prediction:
+        return pred, probs
     # Log prediction
     try:
-        mongo.db.predictions.insert_one({
-            "text": text,
-            "clean_text": clean,
-            "predicted": pred,
-            "probs": probs,
-            "model_version": _active_version,
-            "created_at": datetime.utcnow()
-        })
+        with metrics.timed("mongo_log"):
+            mongo.db.predictions.insert_one(
+                build_log_document(
+                    text,
+                    clean,
+                    pred,
+                    probs,
+                    EMOTION_LABELS,
+                    _active_version,
+                    EMOTION_LABELS,
+                    current_app.config,
+                )
+            )
     except Exception:
         pass
     return pred, probs
@@ -315,19 +348,34 @@ def _aggregate_chunk_predictions(predictions):
     return best, probs
 
 
-def predict_emotion(text):
+def predict_emotion(text, model=None, vectorizer=None, log_prediction=True, force_long_text=False, segments=None):
+    # segments: separately sourced parts of text (e.g. one per image) that are
+    # chunked on their own, so no chunk mixes two of them.
     text = (text or "").strip()
     if not text:
         return "Neutral", [1.0 if label == "Neutral" else 0.0 for label in EMOTION_LABELS]
 
-    if len(text) <= 900:
-        return _predict_single(text)
-
-    chunks = _split_long_text(text, target_chunk_chars=450)
-    # Keep bounded work for very large inputs.
-    chunks = chunks[:120]
-    chunk_predictions = []
-    for chunk in chunks:
-        pred, probs = _predict_single(chunk)
-        chunk_predictions.append((pred, probs, max(len(chunk), 1)))
-    return _aggregate_chunk_predictions(chunk_predictions)
+    if len(text) <= 900 and not force_long_text and not segments:
+        pred, probs = _predict_single(text, model, vectorizer, log_prediction)
+    else:
+        with metrics.timed("split_long_text"):
+            chunks = [
+                chunk
+                for part in (segments or [text])
+                if part.strip()
+                for chunk in _split_long_text(part.strip(), target_chunk_chars=450)
+            ]
+        # Keep bounded work for very large inputs.
+        chunks = chunks[:120]
+        metrics.observe("emotion_long_text_chunks", len(chunks), buckets=metrics.CHUNK_BUCKETS)
+        chunk_predictions = []
+        for chunk in chunks:
+            pred, probs = _predict_single(chunk, model, vectorizer, log_prediction)
+            chunk_predictions.append((pred, probs, max(len(chunk), 1)))
+        with metrics.timed("aggregate_chunks"):
+            pred, probs = _aggregate_chunk_predictions(chunk_predictions)
+
+    if log_prediction:
+        with metrics.timed("mongo_rollup"):
+            record_prediction(pred, _active_version)
+    return pred, probs
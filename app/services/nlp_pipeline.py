@@ -1,13 +1,8 @@
 import re
+import threading
 
-try:
-    import spacy
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except Exception:
-        nlp = None
-except ImportError:
-    nlp = None
+_nlp_lock = threading.Lock()
+_nlp_state = {"loaded": False, "nlp": None}
 
 EMOJI_MAP = {
     ":)": "happy",
@@ -17,6 +12,22 @@ EMOJI_MAP = {
 }
 
 
+def get_nlp():
+    # spaCy and its model take seconds to import, so they load on first use
+    # (or from the startup warmup) instead of at import time.
+    if not _nlp_state["loaded"]:
+        with _nlp_lock:
+            if not _nlp_state["loaded"]:
+                try:
+                    import spacy
+
+                    _nlp_state["nlp"] = spacy.load("en_core_web_sm")
+                except Exception:
+                    _nlp_state["nlp"] = None
+                _nlp_state["loaded"] = True
+    return _nlp_state["nlp"]
+
+
 def preprocess_text(text):
     if not text:
         return ""
@@ -25,6 +36,7 @@ def preprocess_text(text):
         text = text.replace(k, f" {v} ")
     text = re.sub(r"[^\w\s]", " ", text)
     text = re.sub(r"\s+", " ", text).strip()
+    nlp = get_nlp()
     if nlp is None:
         return text
     doc = nlp(text)
@@ -1,16 +1,235 @@
-def extract_text_from_image(file_obj):
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from . import metrics
+
+_config = {
+    "max_workers": 2,
+    "queue_size": 8,
+    "timeout": 20.0,
+    "cache_size": 512,
+    "target_dpi": 300,
+    "max_width": 1600,
+    "crop_top": 0.0,
+    "crop_bottom": 0.0,
+}
+_lock = threading.Lock()
+_cache = OrderedDict()
+_state = {"executor": None, "pid": None, "in_flight": 0}
+
+
+def configure(max_workers=2, queue_size=8, timeout=20.0, cache_size=512, target_dpi=300,
+              max_width=1600, crop_top=0.0, crop_bottom=0.0):
+    _config.update(
+        max_workers=max(int(max_workers), 1),
+        queue_size=max(int(queue_size), 1),
+        timeout=float(timeout),
+        cache_size=max(int(cache_size), 0),
+        target_dpi=int(target_dpi),
+        max_width=int(max_width),
+        crop_top=float(crop_top),
+        crop_bottom=float(crop_bottom),
+    )
+    # Tesseract's OpenMP threads fight each other when several jobs run at once.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def _cache_stats():
+    with _lock:
+        entries, in_flight = len(_cache), _state["in_flight"]
+    return [
+        ("emotion_ocr_cache_entries", {}, entries),
+        ("emotion_ocr_in_flight", {}, in_flight),
+    ]
+
+
+metrics.register_gauge_callback(_cache_stats)
+
+
+def _cache_get(key):
+    with _lock:
+        text = _cache.get(key)
+        if text is not None:
+            _cache.move_to_end(key)
+        return text
+
+
+def _cache_put(key, text):
+    if not _config["cache_size"]:
+        return
+    with _lock:
+        _cache[key] = text
+        _cache.move_to_end(key)
+        while len(_cache) > _config["cache_size"]:
+            _cache.popitem(last=False)
+
+
+def _executor():
+    pid = os.getpid()
+    with _lock:
+        if _state["executor"] is None or _state["pid"] != pid:
+            _state.update(
+                executor=ThreadPoolExecutor(max_workers=_config["max_workers"], thread_name_prefix="ocr"),
+                pid=pid,
+                in_flight=0,
+            )
+        return _state["executor"]
+
+
+def _otsu_threshold(histogram):
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_threshold, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if not background:
+            continue
+        foreground = total - background
+        if not foreground:
+            break
+        weighted_background += level * count
+        mean_bg = weighted_background / background
+        mean_fg = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_bg - mean_fg) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = level, variance
+    return best_threshold
+
+
+def preprocess_image(image):
+    from PIL import Image, ImageOps
+
+    # Read before any conversion: alpha_composite returns an image without info.
+    dpi = image.info.get("dpi")
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, "white")
+        image = Image.alpha_composite(background, image)
+    gray = image.convert("L")
+
+    scale = 1.0
+    if dpi and dpi[0] and dpi[0] > _config["target_dpi"]:
+        scale = _config["target_dpi"] / float(dpi[0])
+    if gray.width * scale > _config["max_width"]:
+        scale = _config["max_width"] / float(gray.width)
+    if scale < 1.0:
+        gray = gray.resize((max(int(gray.width * scale), 1), max(int(gray.height * scale), 1)), Image.LANCZOS)
+
+    # Optional trim of a phone screenshot's status bar/header and compose box.
+    # Off by default: long or already-cropped captures have message text there.
+    if (_config["crop_top"] or _config["crop_bottom"]) and gray.height > 1.5 * gray.width:
+        top = int(gray.height * _config["crop_top"])
+        bottom = gray.height - int(gray.height * _config["crop_bottom"])
+        gray = gray.crop((0, top, gray.width, bottom))
+
+    histogram = gray.histogram()
+    threshold = _otsu_threshold(histogram)
+    dark_pixels = sum(histogram[: threshold + 1])
+    if dark_pixels > sum(histogram) / 2:
+        # Dark mode: flip so tesseract sees dark text on a light background.
+        return gray.point(lambda p: 0 if p > threshold else 255)
+    return gray.point(lambda p: 255 if p > threshold else 0)
+
+
+def _run_ocr(data):
+    from PIL import Image
+    import pytesseract
+
+    start = time.perf_counter()
+    image = preprocess_image(Image.open(io.BytesIO(data)))
+    preprocess_seconds = time.perf_counter() - start
+    # pytesseract kills the tesseract child when the timeout expires.
+    text = pytesseract.image_to_string(
+        image, config=f"--dpi {_config['target_dpi']}", timeout=_config["timeout"]
+    )
+    return (text or "").strip(), preprocess_seconds, time.perf_counter() - start
+
+
+def _job_done(_future):
+    with _lock:
+        _state["in_flight"] -= 1
+
+
+def _submit(data):
+    # Jobs stay counted until they actually finish, even if the caller gave up
+    # waiting, so abandoned work still holds its slot.
+    executor = _executor()
+    with _lock:
+        if _state["in_flight"] >= _config["max_workers"] + _config["queue_size"]:
+            return None
+        _state["in_flight"] += 1
     try:
-        from PIL import Image
-        import pytesseract
+        future = executor.submit(_run_ocr, data)
     except Exception:
-        return None, "OCR dependencies missing. Install Pillow and pytesseract."
+        _job_done(None)
+        raise
+    future.add_done_callback(_job_done)
+    return future
+
 
+def _start(data):
+    key = hashlib.sha256(data).hexdigest()
+    text = _cache_get(key)
+    if text is not None:
+        metrics.inc("emotion_ocr_cache_total", result="hit")
+        return key, text, None
+    metrics.inc("emotion_ocr_cache_total", result="miss")
+    return key, None, _submit(data)
+
+
+def _collect(key, text, future):
+    result = {"text": text, "error": None, "cached": text is not None, "seconds": 0.0}
+    if text is None:
+        if future is None:
+            metrics.inc("emotion_ocr_rejected_total")
+            return dict(result, error="OCR is busy. Please try again shortly.")
+        try:
+            # Slack on top of tesseract's own timeout covers queueing and preprocessing.
+            text, preprocess_seconds, seconds = future.result(timeout=_config["timeout"] * 2)
+        except (FutureTimeout, RuntimeError) as exc:
+            if isinstance(exc, FutureTimeout) or "timeout" in str(exc).lower():
+                metrics.inc("emotion_ocr_timeouts_total")
+                return dict(result, error="Reading the screenshot timed out. Try a smaller or clearer image.")
+            return dict(result, error="Failed to read screenshot. Use a clear chat image (PNG/JPG).")
+        except Exception:
+            return dict(result, error="Failed to read screenshot. Use a clear chat image (PNG/JPG).")
+        metrics.observe("emotion_stage_seconds", preprocess_seconds, stage="ocr_preprocess")
+        metrics.observe("emotion_stage_seconds", seconds, stage="ocr")
+        _cache_put(key, text)
+        result.update(text=text, seconds=seconds)
+    if not text:
+        return dict(result, text=None, error="No readable text found in image.")
+    return result
+
+
+def _dependencies_error():
     try:
-        image = Image.open(file_obj).convert("RGB")
-        text = pytesseract.image_to_string(image)
-        text = (text or "").strip()
-        if not text:
-            return None, "No readable text found in image."
-        return text, None
+        from PIL import Image  # noqa: F401
+        import pytesseract  # noqa: F401
     except Exception:
-        return None, "Failed to read screenshot. Use a clear chat image (PNG/JPG)."
+        return "OCR dependencies missing. Install Pillow and pytesseract."
+    return None
+
+
+def extract_text_from_image(file_obj):
+    err = _dependencies_error()
+    if err:
+        return None, err
+    result = _collect(*_start(file_obj.read()))
+    return result["text"], result["error"]
+
+
+def extract_texts_from_images(file_objs):
+    err = _dependencies_error()
+    if err:
+        return [{"text": None, "error": err, "cached": False, "seconds": 0.0} for _ in file_objs]
+    # Submit everything before waiting so the images share the pool concurrently;
+    # results come back in upload order.
+    jobs = [_start(f.read()) for f in file_objs]
+    return [_collect(*job) for job in jobs]
@@ -0,0 +1,53 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(doc, sort_field):
+    value = doc.get(sort_field)
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    elif isinstance(value, ObjectId):
+        value = {"$oid": str(value)}
+    payload = json.dumps({"v": value, "id": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value = payload["v"]
+        if isinstance(value, dict) and "$date" in value:
+            value = datetime.fromisoformat(value["$date"])
+        elif isinstance(value, dict) and "$oid" in value:
+            value = ObjectId(value["$oid"])
+        return value, ObjectId(payload["id"])
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def keyset_page(collection, sort_field, projection, limit, cursor=None, query=None):
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    query = dict(query or {})
+    sort = [(sort_field, -1)] if sort_field == "_id" else [(sort_field, -1), ("_id", -1)]
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        if sort_field == "_id":
+            query["_id"] = {"$lt": last_id}
+        else:
+            # Resume strictly after the last (sort_field, _id) pair already returned.
+            query["$or"] = [
+                {sort_field: {"$lt": value}},
+                {sort_field: value, "_id": {"$lt": last_id}},
+            ]
+
+    projection = dict(projection)
+    if all(projection.values()):
+        projection.setdefault(sort_field, 1)
+    docs = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    next_cursor = encode_cursor(docs[limit - 1], sort_field) if len(docs) > limit else None
+    return docs[:limit], next_cursor
@@ -0,0 +1,157 @@
+import hashlib
+from datetime import datetime
+import numpy as np
+from bson.binary import Binary
+from pymongo import ReplaceOne
+from .labels import EMOTION_LABELS, LEGACY_TO_EXPANDED, canonical_scores
+
+COMPACT_FORMAT = "compact"
+# Full documents carrying this marker hold probs in EMOTION_LABELS order.
+CANONICAL_ORDER = "canonical"
+
+
+def _label_index(labels):
+    return {label: i for i, label in enumerate(labels)}
+
+
+def build_log_document(text, clean, pred, probs, prob_labels, model_version, labels, config=None):
+    config = config or {}
+    created_at = datetime.utcnow()
+    if config.get("PREDICTION_LOG_MODE", "full") != COMPACT_FORMAT:
+        return {
+            "text": text,
+            "clean_text": clean,
+            "predicted": pred,
+            "probs": canonical_scores(probs, prob_labels) if probs else [],
+            "label_order": CANONICAL_ORDER,
+            "model_version": model_version,
+            "created_at": created_at,
+        }
+
+    index = _label_index(labels)
+    top_k = config.get("PREDICTION_LOG_TOP_K", 3)
+    ranked = sorted(range(len(probs)), key=lambda i: probs[i], reverse=True)
+    top_idx = []
+    top_p = []
+    for i in ranked:
+        # Probabilities follow the model's class order; store indices into the
+        # canonical label list so every model version decodes the same way.
+        label = prob_labels[i] if i < len(prob_labels) else None
+        if label not in index or probs[i] <= 0:
+            continue
+        top_idx.append(index[label])
+        top_p.append(probs[i])
+        if len(top_idx) >= top_k:
+            break
+
+    doc = {
+        "fmt": COMPACT_FORMAT,
+        "predicted": pred,
+        "top_idx": top_idx,
+        "top_p": Binary(np.asarray(top_p, dtype="<f2").tobytes()),
+        "model_version": model_version,
+        "created_at": created_at,
+    }
+    text_mode = config.get("PREDICTION_LOG_TEXT", "hash")
+    if text_mode == "full":
+        doc["text"] = text
+    elif text_mode == "hash":
+        doc["text_hash"] = Binary(hashlib.sha256((text or "").encode("utf-8")).digest())
+    return doc
+
+
+def _fits_prediction(scores, predicted):
+    i = _label_index(EMOTION_LABELS).get(LEGACY_TO_EXPANDED.get(predicted, predicted))
+    return i is not None and scores[i] > 0 and scores[i] == max(scores)
+
+
+def full_document_scores(doc, class_order=None):
+    # Returns the document's probs in EMOTION_LABELS order, or None when that
+    # order cannot be established.
+    probs = doc.get("probs") or []
+    if not probs:
+        return []
+    if doc.get("label_order") == CANONICAL_ORDER:
+        return [float(p) for p in probs]
+    # Older full documents hold either the model's predict_proba row (in its
+    # classes_ order) or a keyword/override vector already in label order,
+    # with no record of which. Keep only readings whose best label is the
+    # stored prediction, and give up if the survivors disagree.
+    classes = class_order(doc.get("model_version")) if class_order else None
+    readings = []
+    if len(probs) == len(EMOTION_LABELS):
+        readings.append([float(p) for p in probs])
+    if classes is not None and len(classes) == len(probs):
+        readings.append(canonical_scores(probs, classes))
+    readings = [r for r in readings if _fits_prediction(r, doc.get("predicted"))]
+    if not readings or any(r != readings[0] for r in readings[1:]):
+        return None
+    return readings[0]
+
+
+def decode_log_document(doc, labels, class_order=None):
+    # class_order maps a model_version to that model's classes_ (or None);
+    # without it only documents written in label order can be read.
+    decoded = {
+        "predicted": doc.get("predicted"),
+        "model_version": doc.get("model_version"),
+        "created_at": doc.get("created_at"),
+        "text": doc.get("text"),
+    }
+    if doc.get("fmt") != COMPACT_FORMAT:
+        scores = full_document_scores(doc, class_order) or []
+        decoded["top"] = sorted(
+            ((label, p) for label, p in zip(labels, scores) if p > 0), key=lambda x: x[1], reverse=True
+        )
+        decoded["probs"] = scores
+        return decoded
+
+    top_p = np.frombuffer(bytes(doc.get("top_p") or b""), dtype="<f2").astype(float).tolist()
+    top = [(labels[i], p) for i, p in zip(doc.get("top_idx") or [], top_p) if i < len(labels)]
+    dense = [0.0] * len(labels)
+    for i, p in zip(doc.get("top_idx") or [], top_p):
+        if i < len(labels):
+            dense[i] = p
+    decoded["top"] = top
+    decoded["probs"] = dense
+    if doc.get("text_hash") is not None:
+        decoded["text_hash"] = bytes(doc["text_hash"]).hex()
+    return decoded
+
+
+def compact_existing(collection, labels, config, class_order=None, batch_size=1000):
+    # Returns (converted, skipped). Documents whose label order cannot be
+    # established are left in the full format rather than guessed at.
+    converted = skipped = 0
+    last_id = None
+    while True:
+        query = {"fmt": {"$ne": COMPACT_FORMAT}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(collection.find(query).sort("_id", 1).limit(batch_size))
+        if not batch:
+            return converted, skipped
+
+        ops = []
+        for doc in batch:
+            probs = full_document_scores(doc, class_order)
+            if probs is None:
+                skipped += 1
+                continue
+            compact = build_log_document(
+                doc.get("text"),
+                doc.get("clean_text"),
+                doc.get("predicted"),
+                probs,
+                EMOTION_LABELS,
+                doc.get("model_version"),
+                labels,
+                dict(config, PREDICTION_LOG_MODE=COMPACT_FORMAT),
+            )
+            compact["created_at"] = doc.get("created_at") or compact["created_at"]
+            compact["_id"] = doc["_id"]
+            ops.append(ReplaceOne({"_id": doc["_id"]}, compact))
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+        converted += len(ops)
+        last_id = batch[-1]["_id"]
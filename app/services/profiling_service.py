@@ -0,0 +1,180 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import time
+from collections import defaultdict
+from functools import wraps
+
+PROFILE_NAME_RE = re.compile(r"^[\w.-]+\.pstats$")
+CONTROL_CHECK_SECONDS = 2.0
+MAX_PROFILE_SECONDS = 3600
+
+_config = {"dir": None, "max_files": 200}
+_state = {"until": 0.0, "sample_rate": 0.0, "next_check": 0.0, "mtime": None}
+
+
+def configure(profile_dir, max_files=200):
+    _config["dir"] = profile_dir
+    _config["max_files"] = max_files
+
+
+def _control_path():
+    return os.path.join(_config["dir"], "control.json")
+
+
+def _refresh(now):
+    # Workers share the toggle through a control file, re-read at most every
+    # CONTROL_CHECK_SECONDS so the common path is a single float comparison.
+    _state["next_check"] = now + CONTROL_CHECK_SECONDS
+    try:
+        mtime = os.path.getmtime(_control_path())
+    except OSError:
+        _state.update(until=0.0, sample_rate=0.0, mtime=None)
+        return
+    if mtime == _state["mtime"]:
+        return
+    try:
+        with open(_control_path(), encoding="utf-8") as fh:
+            control = json.load(fh)
+        _state.update(
+            until=float(control.get("until", 0)),
+            sample_rate=float(control.get("sample_rate", 0)),
+            mtime=mtime,
+        )
+    except (OSError, ValueError):
+        _state.update(until=0.0, sample_rate=0.0, mtime=mtime)
+
+
+def _should_sample():
+    now = time.time()
+    if now >= _state["next_check"]:
+        _refresh(now)
+    return now < _state["until"] and random.random() < _state["sample_rate"]
+
+
+def status():
+    if _config["dir"]:
+        _refresh(time.time())
+    remaining = max(0.0, _state["until"] - time.time())
+    return {
+        "enabled": remaining > 0,
+        "sample_rate": _state["sample_rate"] if remaining > 0 else 0.0,
+        "remaining_seconds": round(remaining, 1),
+    }
+
+
+def enable(sample_rate, duration_seconds):
+    os.makedirs(_config["dir"], exist_ok=True)
+    control = {
+        "sample_rate": min(max(float(sample_rate), 0.0), 1.0),
+        "until": time.time() + min(max(float(duration_seconds), 0.0), MAX_PROFILE_SECONDS),
+    }
+    tmp_path = _control_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(control, fh)
+    os.replace(tmp_path, _control_path())
+    _state["next_check"] = 0.0
+    return status()
+
+
+def disable():
+    try:
+        os.remove(_control_path())
+    except OSError:
+        pass
+    _state.update(until=0.0, sample_rate=0.0, next_check=0.0, mtime=None)
+    return status()
+
+
+def _save(profiler, label):
+    directory = _config["dir"]
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    name = f"{stamp}-{label}-{os.getpid()}-{random.randrange(16 ** 6):06x}.pstats"
+    profiler.dump_stats(os.path.join(directory, name))
+
+    profiles = list_profiles()
+    for old in profiles[_config["max_files"]:]:
+        try:
+            os.remove(os.path.join(directory, old["name"]))
+        except OSError:
+            pass
+
+
+def profiled(label):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _config["dir"] or not _should_sample():
+                return fn(*args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(fn, *args, **kwargs)
+            finally:
+                try:
+                    _save(profiler, label)
+                except Exception:
+                    pass
+        return wrapper
+    return decorator
+
+
+def list_profiles():
+    directory = _config["dir"]
+    if not directory or not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if PROFILE_NAME_RE.match(name):
+            path = os.path.join(directory, name)
+            profiles.append({"name": name, "bytes": os.path.getsize(path), "mtime": os.path.getmtime(path)})
+    return sorted(profiles, key=lambda p: p["mtime"], reverse=True)
+
+
+def profile_path(name):
+    if not PROFILE_NAME_RE.match(name or ""):
+        return None
+    path = os.path.join(_config["dir"], name)
+    return path if os.path.isfile(path) else None
+
+
+def _frame_label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def to_collapsed(path, max_depth=64):
+    # Approximates stacks from cProfile's caller graph: each callee's time is
+    # split across callers in proportion to the time they spent in it.
+    stats = pstats.Stats(path).stats
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, caller_stats in callers.items():
+            callees[caller][func] = caller_stats[3]
+
+    totals = defaultdict(float)
+
+    def walk(func, stack, share):
+        own = stats[func][2]
+        stack = stack + [_frame_label(func)]
+        totals[";".join(stack)] += own * share
+        if len(stack) >= max_depth:
+            return
+        for callee, time_from_here in callees.get(func, {}).items():
+            callee_total = stats[callee][3]
+            # Skip sub-microsecond branches; they would only multiply the paths walked.
+            if callee_total <= 0 or share * time_from_here < 1e-6 or _frame_label(callee) in stack:
+                continue
+            walk(callee, stack, share * time_from_here / callee_total)
+
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            walk(func, [], 1.0)
+
+    lines = [f"{stack} {int(round(seconds * 1e6))}" for stack, seconds in totals.items() if seconds > 0]
+    return "\n".join(sorted(lines)) + "\n"
@@ -0,0 +1,99 @@
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from . import metrics
+
+_config = {
+    "path": None,
+    "capacity": 20.0,
+    "refill_per_second": 20.0 / 60.0,
+    "base_cost": 1.0,
+    "chunk_cost": 0.25,
+    "ocr_cost": 3.0,
+}
+_local = threading.local()
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+
+
+def configure(path, capacity=20.0, refill_per_minute=20.0, base_cost=1.0, chunk_cost=0.25, ocr_cost=3.0):
+    _config.update(
+        path=path,
+        capacity=float(capacity),
+        refill_per_second=max(float(refill_per_minute), 0.001) / 60.0,
+        base_cost=float(base_cost),
+        chunk_cost=float(chunk_cost),
+        ocr_cost=float(ocr_cost),
+    )
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+
+def enabled():
+    return bool(_config["path"])
+
+
+def capacity():
+    return _config["capacity"]
+
+
+def estimate_chunks(chars, long_text=False):
+    # Mirrors predict_emotion: long texts are split into ~450-char chunks (at
+    # most 120), each costing a spaCy pass and a model call.
+    if chars <= 900 and not long_text:
+        return 1
+    return max(min(int(math.ceil(chars / 450.0)), 120), 1)
+
+
+def request_cost(chars, images=0, long_text=False, chunks=None):
+    chunks = chunks or estimate_chunks(chars, long_text)
+    return _config["base_cost"] + _config["chunk_cost"] * (chunks - 1) + _config["ocr_cost"] * images
+
+
+def _connection():
+    # The bucket table lives in a small SQLite file so every worker process on
+    # the host draws from the same budget.
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != _config["path"]:
+        conn = sqlite3.connect(_config["path"], timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(SCHEMA)
+        _local.conn, _local.path = conn, _config["path"]
+    return conn
+
+
+def consume(key, cost, allow_debt=False):
+    # Returns (allowed, remaining, retry_after_seconds). With allow_debt the
+    # cost is always charged, even past zero, so work already admitted is
+    # billed in full and the caller waits longer next time.
+    rate, cap = _config["refill_per_second"], _config["capacity"]
+    now = time.time()
+    conn = None
+    try:
+        conn = _connection()
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        tokens = cap if row is None else min(cap, row[0] + max(now - row[1], 0.0) * rate)
+        # A request bigger than the whole bucket is admitted once the bucket is
+        # full rather than never.
+        allowed = allow_debt or tokens >= min(cost, cap)
+        if allowed:
+            tokens -= cost
+        conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+        if random.random() < 0.01:
+            # Buckets idle long enough to be full again carry no state worth keeping.
+            conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 2 * cap / rate,))
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn is not None and conn.in_transaction:
+            conn.execute("ROLLBACK")
+        # A locked or unwritable quota file must not take predictions down with it.
+        metrics.inc("emotion_quota_total", result="error")
+        return True, None, 0.0
+    metrics.inc("emotion_quota_total", result="allowed" if allowed else "denied")
+    retry_after = 0.0 if allowed else (min(cost, cap) - tokens) / rate
+    return allowed, tokens, retry_after
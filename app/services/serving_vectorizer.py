@@ -0,0 +1,135 @@
+import re
+import numpy as np
+
+# Bigram terms are split back into words on " ", which is only unambiguous
+# when tokens cannot contain spaces; the default pattern guarantees that.
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+
+class CompactTfidfVectorizer:
+    # Drop-in for a fitted word-level TfidfVectorizer at serving time. Instead
+    # of a dict of every unigram and bigram string, it keeps one id per
+    # distinct word plus bigram columns in a sorted int64 array keyed by the
+    # (word id, word id) pair, so transform never builds bigram strings.
+    # Counting is identical to CountVectorizer, and weighting repeats
+    # TfidfTransformer.transform step for step with the kernels normalize()
+    # uses (minus its per-call input validation), so output matches exactly.
+
+    def __init__(self, vectorizer):
+        self.encoding = vectorizer.encoding
+        self.decode_error = vectorizer.decode_error
+        self.lowercase = vectorizer.lowercase
+        self.binary = vectorizer.binary
+        self.dtype = vectorizer.dtype
+        self.min_n, self.max_n = vectorizer.ngram_range
+        self._token_re = re.compile(vectorizer.token_pattern)
+        self.sublinear_tf = vectorizer._tfidf.sublinear_tf
+        self.norm = vectorizer._tfidf.norm
+        self.idf_ = getattr(vectorizer._tfidf, "idf_", None)
+        self.n_features = len(vectorizer.vocabulary_)
+
+        words = {}
+        unigrams = {}
+        bigrams = []
+        for term, column in vectorizer.vocabulary_.items():
+            parts = term.split(" ")
+            ids = [words.setdefault(part, len(words)) for part in parts]
+            if len(ids) == 1:
+                unigrams[ids[0]] = column
+            else:
+                bigrams.append((ids[0], ids[1], column))
+
+        self._words = words
+        self._unigram_columns = np.full(len(words), -1, dtype=np.int32)
+        for word_id, column in unigrams.items():
+            self._unigram_columns[word_id] = column
+        pairs = np.asarray(bigrams, dtype=np.int64).reshape(-1, 3)
+        keys = pairs[:, 0] * len(words) + pairs[:, 1]
+        order = np.argsort(keys)
+        self._bigram_keys = keys[order]
+        self._bigram_columns = pairs[order, 2].astype(np.int32)
+
+    @staticmethod
+    def supports(vectorizer):
+        # Anything beyond plain regex word tokens with uni/bigrams is left to sklearn.
+        return (
+            getattr(vectorizer, "analyzer", None) == "word"
+            and getattr(vectorizer, "vocabulary_", None) is not None
+            and getattr(vectorizer, "_tfidf", None) is not None
+            and vectorizer.tokenizer is None
+            and vectorizer.preprocessor is None
+            and vectorizer.stop_words is None
+            and vectorizer.strip_accents is None
+            and vectorizer.input == "content"
+            and vectorizer.token_pattern == TOKEN_PATTERN
+            and 1 <= vectorizer.ngram_range[0] <= vectorizer.ngram_range[1] <= 2
+        )
+
+    def _columns(self, doc):
+        if isinstance(doc, bytes):
+            doc = doc.decode(self.encoding, self.decode_error)
+        if self.lowercase:
+            doc = doc.lower()
+        ids = np.fromiter(
+            (self._words.get(token, -1) for token in self._token_re.findall(doc)), dtype=np.int64
+        )
+        found = []
+        if self.min_n == 1 and ids.size:
+            columns = self._unigram_columns[ids[ids >= 0]]
+            found.append(columns[columns >= 0])
+        if self.max_n == 2 and ids.size > 1 and self._bigram_keys.size:
+            first, second = ids[:-1], ids[1:]
+            keys = (first * len(self._words) + second)[(first >= 0) & (second >= 0)]
+            positions = np.minimum(np.searchsorted(self._bigram_keys, keys), self._bigram_keys.size - 1)
+            found.append(self._bigram_columns[positions[self._bigram_keys[positions] == keys]])
+        if not found:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.intc)
+        columns, counts = np.unique(np.concatenate(found), return_counts=True)
+        return columns.astype(np.int32), counts
+
+    def transform(self, raw_documents):
+        # Imported here like the rest of the sklearn stack, so the app still
+        # boots (on the keyword fallback) without scikit-learn installed.
+        import scipy.sparse as sp
+        from sklearn.utils.sparsefuncs_fast import inplace_csr_row_normalize_l1, inplace_csr_row_normalize_l2
+
+        if isinstance(raw_documents, (str, bytes)):
+            raise ValueError("Iterable over raw text documents expected, string object received.")
+        indices, values, indptr = [], [], [0]
+        for doc in raw_documents:
+            columns, counts = self._columns(doc)
+            indices.append(columns)
+            values.append(counts)
+            indptr.append(indptr[-1] + columns.size)
+        X = sp.csr_matrix(
+            (
+                np.concatenate(values) if values else np.empty(0),
+                np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+                np.asarray(indptr, dtype=np.int32),
+            ),
+            shape=(len(indptr) - 1, self.n_features),
+            dtype=self.dtype,
+        )
+        if self.binary:
+            X.data.fill(1)
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if self.idf_ is not None:
+            X.data *= self.idf_[X.indices]
+        if self.norm == "l2":
+            inplace_csr_row_normalize_l2(X)
+        elif self.norm == "l1":
+            inplace_csr_row_normalize_l1(X)
+        return X
+
+
+def compact_vectorizer(vectorizer):
+    if isinstance(vectorizer, CompactTfidfVectorizer) or not CompactTfidfVectorizer.supports(vectorizer):
+        return vectorizer
+    try:
+        import scipy.sparse  # noqa: F401
+        from sklearn.utils import sparsefuncs_fast  # noqa: F401
+    except ImportError:
+        return vectorizer
+    return CompactTfidfVectorizer(vectorizer)
@@ -1,9 +1,16 @@
+import math
 import os
 import joblib
-import csv
 import re
 from datetime import datetime
+from flask import current_app
 from .nlp_pipeline import preprocess_text
+from .benchmark_service import benchmark_model, prediction_agreement
+from .compaction_service import compact_model, restore_serving_dtype
+from . import artifact_store
+from .dataset_service import iter_csv_records
+from .dedup_service import find_near_duplicates
+from .model_service import serving_artifact_paths
 from ..extensions import mongo
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
@@ -20,18 +27,6 @@ def _ensure_dirs():
         os.makedirs(DATA_DIR, exist_ok=True)
 
 
-def _normalize_key(key):
-    return str(key or "").replace("\ufeff", "").strip().strip('"').strip("'").lower()
-
-
-def _row_value(row, name):
-    target = _normalize_key(name)
-    for k, v in (row or {}).items():
-        if _normalize_key(k) == target:
-            return v
-    return ""
-
-
 def _split_for_training(text, target_chunk_chars=MAX_TRAIN_CHUNK_CHARS):
     text = str(text or "").strip()
     if not text:
@@ -61,11 +56,72 @@ def _split_for_training(text, target_chunk_chars=MAX_TRAIN_CHUNK_CHARS):
     return chunks
 
 
+def _active_serving_baseline(active_doc, sample):
+    if not active_doc:
+        return None
+    # Re-measure the active model on the same sample and host when possible,
+    # so the comparison is not skewed by machine or load differences.
+    active_model_path, active_vec_path = serving_artifact_paths(active_doc)
+    try:
+        active_model, active_vectorizer = restore_serving_dtype(
+            joblib.load(active_model_path), joblib.load(active_vec_path)
+        )
+    except Exception:
+        return active_doc.get("serving")
+    return benchmark_model(
+        active_model, active_vectorizer, sample, active_model_path, active_vec_path
+    )
+
+
+def _compact_for_serving(model, vectorizer, sample):
+    config = current_app.config
+    if not config.get("COMPACT_MODEL_ENABLED", True):
+        return None, model, vectorizer
+
+    small_model, small_vectorizer, stats = compact_model(
+        model,
+        vectorizer,
+        coef_threshold=config.get("COMPACT_COEF_THRESHOLD", 0.01),
+        dtype=config.get("COMPACT_DTYPE", "float32"),
+    )
+    model_path = artifact_store.put_object(small_model)
+    vec_path = artifact_store.put_object(small_vectorizer)
+
+    small_model, small_vectorizer = restore_serving_dtype(small_model, small_vectorizer)
+    agreement = prediction_agreement(model, vectorizer, small_model, small_vectorizer, sample)
+    accepted = agreement >= config.get("COMPACT_MIN_AGREEMENT", 0.98)
+    stats.update(
+        {
+            "model_path": model_path,
+            "vectorizer_path": vec_path,
+            "agreement": agreement,
+            "accepted": accepted,
+        }
+    )
+    if not accepted:
+        return stats, model, vectorizer
+    return stats, small_model, small_vectorizer
+
+
+def _check_latency_gate(serving, baseline):
+    max_ratio = current_app.config.get("MAX_P99_LATENCY_REGRESSION", 0)
+    if not max_ratio or not baseline:
+        return True, None
+    base_p99 = (baseline.get("latency_ms") or {}).get("p99") or 0
+    new_p99 = serving["latency_ms"]["p99"]
+    if base_p99 > 0 and new_p99 > base_p99 * max_ratio:
+        return False, (
+            f"p99 latency {new_p99:.2f} ms exceeds {max_ratio:g}x "
+            f"the active model ({base_p99:.2f} ms)"
+        )
+    return True, None
+
+
 def train_from_mongo():
     _ensure_dirs()
     mongo_available = True
     try:
-        datasets = list(mongo.db.datasets.find())
+        datasets = list(mongo.db.datasets.find({}, {"text": 1, "label": 1, "_id": 0}))
     except Exception:
         mongo_available = False
         datasets = []
@@ -81,10 +137,7 @@ def train_from_mongo():
 
         for csv_path in csv_files:
             with open(csv_path, newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    t = str(_row_value(row, "text")).strip()
-                    y = str(_row_value(row, "label")).strip() or "Neutral"
+                for t, y in iter_csv_records(f, default_label="Neutral"):
                     if t:
                         texts.append(t)
                         labels.append(y)
@@ -95,12 +148,14 @@ def train_from_mongo():
         texts = [d.get("text", "") for d in datasets]
         labels = [d.get("label", "Neutral") for d in datasets]
 
+    expanded_raw = []
     expanded_texts = []
     expanded_labels = []
     for t, y in zip(texts, labels):
         for chunk in _split_for_training(t):
             clean = preprocess_text(chunk)
             if clean:
+                expanded_raw.append(chunk)
                 expanded_texts.append(clean)
                 expanded_labels.append(y)
 
@@ -109,6 +164,19 @@ def train_from_mongo():
     if not texts:
         return {"error": "No valid text content to train on"}
 
+    near_duplicates = None
+    threshold = current_app.config.get("NEAR_DUP_THRESHOLD", 0)
+    if threshold:
+        keep, near_duplicates = find_near_duplicates(
+            texts,
+            labels,
+            threshold=threshold,
+            num_perm=current_app.config.get("NEAR_DUP_NUM_PERM", 64),
+        )
+        expanded_raw = [expanded_raw[i] for i in keep]
+        texts = [texts[i] for i in keep]
+        labels = [labels[i] for i in keep]
+
     # Lazy import scikit-learn to make it optional in environments without wheels
     try:
         from sklearn.model_selection import train_test_split
@@ -130,11 +198,22 @@ def train_from_mongo():
     for label in y:
         label_counts[label] = label_counts.get(label, 0) + 1
     min_count = min(label_counts.values()) if label_counts else 0
-    use_stratify = len(set(y)) > 1 and min_count >= 2
+    if len(y) < 2:
+        return {"error": "Not enough distinct training rows after near-duplicate removal"}
+    # Stratifying needs every class in both splits; heavily templated data can
+    # shrink below that after near-duplicate removal, so split plainly then.
+    n_test = math.ceil(0.2 * len(y))
+    use_stratify = (
+        len(label_counts) > 1
+        and min_count >= 2
+        and min(n_test, len(y) - n_test) >= len(label_counts)
+    )
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y if use_stratify else None
+    X_train, X_test, y_train, y_test, _, raw_test = train_test_split(
+        X, y, expanded_raw, test_size=0.2, random_state=42, stratify=y if use_stratify else None
     )
+    if len(set(y_train)) < 2:
+        return {"error": "Training split holds a single label; add more distinct rows"}
     model = LogisticRegression(
         max_iter=2000,
         class_weight="balanced",
@@ -149,21 +228,46 @@ def train_from_mongo():
     )
 
     version = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    model_path = os.path.join(ML_DIR, f"emotion_model_{version}.pkl")
-    vec_path = os.path.join(ML_DIR, f"vectorizer_{version}.pkl")
-    joblib.dump(model, model_path)
-    joblib.dump(vectorizer, vec_path)
-    # Keep default paths updated so prediction can work even without Mongo metadata.
-    joblib.dump(model, os.path.join(ML_DIR, "emotion_model.pkl"))
-    joblib.dump(vectorizer, os.path.join(ML_DIR, "vectorizer.pkl"))
+    model_path = artifact_store.put_object(model)
+    vec_path = artifact_store.put_object(vectorizer)
+
+    sample = raw_test[: current_app.config.get("BENCHMARK_SAMPLE_SIZE", 200)]
+    compaction, serving_model, serving_vectorizer = _compact_for_serving(
+        model, vectorizer, sample
+    )
+    serving_model_path, serving_vec_path = model_path, vec_path
+    if compaction and compaction["accepted"]:
+        serving_model_path = compaction["model_path"]
+        serving_vec_path = compaction["vectorizer_path"]
+    serving = benchmark_model(
+        serving_model, serving_vectorizer, sample, serving_model_path, serving_vec_path
+    )
+    active_doc = None
+    if mongo_available:
+        try:
+            active_doc = mongo.db.models.find_one({"status": "active"})
+        except Exception:
+            active_doc = None
+    baseline = _active_serving_baseline(active_doc, sample)
+    promoted, rejection = _check_latency_gate(serving, baseline)
+
+    artifacts = {"model_path": model_path, "vectorizer_path": vec_path}
+    if compaction and compaction["accepted"]:
+        artifacts["compact_model_path"] = compaction["model_path"]
+        artifacts["compact_vectorizer_path"] = compaction["vectorizer_path"]
+    artifact_store.write_version(version, artifacts, promoted=promoted)
+    if promoted:
+        # Keep the default pointer current so prediction can work even without Mongo metadata.
+        artifact_store.set_current(version)
 
     # store metadata in MongoDB
     if mongo_available:
         try:
             models_col = mongo.db.models
-            # archive previously active models correctly
-            models_col.update_many({"status": "active"}, {"$set": {"status": "archived"}})
-            models_col.insert_one({
+            if promoted:
+                # archive previously active models correctly
+                models_col.update_many({"status": "active"}, {"$set": {"status": "archived"}})
+            doc = {
                 "version": version,
                 "model_path": model_path,
                 "vectorizer_path": vec_path,
@@ -173,19 +277,34 @@ def train_from_mongo():
                     "recall": recall,
                     "f1": f1
                 },
-                "status": "active",
+                "serving": serving,
+                "compaction": compaction,
+                "status": "active" if promoted else "rejected",
                 "created_at": datetime.utcnow(),
                 "dataset_count": len(texts),
                 "chunked_training": True,
+                "near_duplicates": near_duplicates,
                 "max_train_chunk_chars": MAX_TRAIN_CHUNK_CHARS,
-            })
+            }
+            doc.update(artifacts)
+            if baseline:
+                doc["baseline_serving"] = baseline
+            if rejection:
+                doc["rejection_reason"] = rejection
+            models_col.insert_one(doc)
         except Exception:
             mongo_available = False
 
     result = {
         "version": version,
-        "metrics": {"accuracy": acc, "precision": precision, "recall": recall, "f1": f1}
+        "metrics": {"accuracy": acc, "precision": precision, "recall": recall, "f1": f1},
+        "serving": serving,
+        "compaction": compaction,
+        "near_duplicates": near_duplicates,
+        "promoted": promoted,
     }
-    if not mongo_available:
+    if rejection:
+        result["warning"] = f"Model not promoted: {rejection}"
+    elif not mongo_available:
         result["warning"] = "Trained with local CSV fallback; MongoDB metadata unavailable"
     return result
@@ -0,0 +1,95 @@
+import heapq
+import numpy as np
+from flask import Response, jsonify, request
+from ..services.labels import EMOTION_LABELS
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+# Little-endian float32 scores in EMOTION_LABELS order (see GET /predict/labels),
+# with the predicted label in the X-Predicted-Emotion header.
+PACKED_F32 = "application/vnd.emotion.scores+f32"
+MAX_ROUND_DIGITS = 6
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+def _int_arg(name, low, high):
+    raw = request.args.get(name)
+    if raw is None and request.is_json:
+        raw = (request.get_json(silent=True) or {}).get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer between {low} and {high}")
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be an integer between {low} and {high}")
+    return value
+
+
+def prediction_format():
+    # Parses ?top_k= / ?round= (or the same keys in a JSON body) and the Accept
+    # header. Returns (options, error_response); check it before doing any work.
+    try:
+        options = {
+            "top_k": _int_arg("top_k", 1, len(EMOTION_LABELS)),
+            "digits": _int_arg("round", 0, MAX_ROUND_DIGITS),
+        }
+    except ValueError as exc:
+        return None, (jsonify({"error": str(exc)}), 400)
+    offered = [JSON, PACKED_F32]
+    if _msgpack() is not None:
+        offered += [MSGPACK, "application/x-msgpack"]
+    if request.accept_mimetypes:
+        mimetype = request.accept_mimetypes.best_match(offered)
+        if mimetype is None:
+            return None, (jsonify({"error": "Not acceptable", "available": offered}), 406)
+    else:
+        mimetype = JSON
+    options["mimetype"] = mimetype
+    return options, None
+
+
+def _label_scores(probs):
+    # predict_emotion returns scores in EMOTION_LABELS order, or nothing when
+    # the model could not produce probabilities.
+    return [float(p) for p in probs] if probs else [0.0] * len(EMOTION_LABELS)
+
+
+def shape_scores(probs, top_k=None, digits=None):
+    # Without top_k the full confidence_scores vector is kept as before (only
+    # rounded); with it, the k best labels replace the vector.
+    if top_k is None:
+        scores = [float(p) for p in probs]
+        return {"confidence_scores": [round(p, digits) for p in scores] if digits is not None else scores}
+    scores = _label_scores(probs)
+    # Zero-probability labels are left out, as in the compact prediction log.
+    best = [i for i in heapq.nlargest(top_k, range(len(scores)), key=scores.__getitem__) if scores[i] > 0]
+    return {
+        "top_emotions": [
+            {"emotion": EMOTION_LABELS[i], "confidence": round(scores[i], digits) if digits is not None else scores[i]}
+            for i in best
+        ]
+    }
+
+
+def prediction_response(payload, probs, options):
+    mimetype = options["mimetype"]
+    if mimetype == PACKED_F32:
+        body = np.asarray(_label_scores(probs), dtype="<f4").tobytes()
+        response = Response(body, mimetype=PACKED_F32)
+        response.headers["X-Predicted-Emotion"] = payload["predicted_emotion"]
+    elif mimetype in (MSGPACK, "application/x-msgpack"):
+        body = dict(payload, **shape_scores(probs, options["top_k"], options["digits"]))
+        response = Response(_msgpack().packb(body, use_single_float=True), mimetype=mimetype)
+    else:
+        response = jsonify(dict(payload, **shape_scores(probs, options["top_k"], options["digits"])))
+    response.vary.add("Accept")
+    return response
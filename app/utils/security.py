@@ -1,17 +1,17 @@
 ﻿import re
 from functools import wraps
-from flask import request, jsonify
-from flask_jwt_extended import get_jwt_identity
-from ..extensions import db
-from ..models.user_model import User
+from flask import g, request, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from ..services import auth_cache, metrics
 
 
 def sanitize_text(text: str) -> str:
     if not isinstance(text, str):
         return ''
-    text = re.sub(r"<[^>]*>", "", text)  # strip HTML tags
-    text = re.sub(r"[\r\n\t]", " ", text)
-    text = text.strip()
+    with metrics.timed("sanitize_text"):
+        text = re.sub(r"<[^>]*>", "", text)  # strip HTML tags
+        text = re.sub(r"[\r\n\t]", " ", text)
+        text = text.strip()
     return text
 
 ALLOWED_TEXT_EXTENSIONS = {"txt", "csv"}
@@ -37,17 +37,32 @@ def get_client_ip():
     return request.headers.get('X-Forwarded-For', request.remote_addr)
 
 
+def current_principal():
+    # The authenticated user's id, role and active flag for this request, taken
+    # from the per-process cache rather than SQL. Quotas and other per-user
+    # checks should key on this. Returns None for unknown or malformed identities.
+    if "principal" in g:
+        return g.principal
+    try:
+        user_id = int(get_jwt_identity())
+    except (TypeError, ValueError):
+        user_id = None
+    status = auth_cache.user_status(user_id) if user_id is not None else None
+    g.principal = dict(status, user_id=user_id) if status else None
+    return g.principal
+
+
 def role_required(role_name):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            identity = get_jwt_identity()
-            try:
-                user_id = int(identity)
-            except (TypeError, ValueError):
+            claims = get_jwt()
+            # Signed claims reject the common mismatch without any lookup;
+            # the cached status catches demotion or deactivation since login.
+            if claims.get("role", role_name) != role_name or claims.get("active") is False:
                 return jsonify({"error": "Unauthorized"}), 403
-            user = db.session.get(User, user_id)
-            if not user or user.role != role_name:
+            principal = current_principal()
+            if not principal or not principal["active"] or principal["role"] != role_name:
                 return jsonify({"error": "Unauthorized"}), 403
             return fn(*args, **kwargs)
         return wrapper
@@ -0,0 +1,225 @@
+"""Micro-benchmarks for the prediction and training hot paths.
+
+Runs offline against an in-memory Mongo stand-in and writes ops/sec and
+latency percentiles as JSON. With --compare, flags cases that got slower
+than a saved baseline and exits non-zero.
+
+    python benchmarks/bench_hot_paths.py --output bench.json
+    python benchmarks/bench_hot_paths.py --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.extensions import mongo  # noqa: E402
+from app.services import artifact_store, model_service, nlp_pipeline, training_service  # noqa: E402
+from app.services.dataset_service import iter_csv_records  # noqa: E402
+from app.services.nlp_pipeline import preprocess_text  # noqa: E402
+import fake_mongo  # noqa: E402
+from bench_utils import SHORT_TEXTS, percentile  # noqa: E402
+
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+
+def _long_text(n_chunks):
+    rng = random.Random(n_chunks)
+    words = " ".join(SHORT_TEXTS).replace(",", "").replace("!", "").replace("?", "").split()
+    sentences = []
+    for _ in range(n_chunks):
+        # Each sentence is just under the 450-char chunk target, so every
+        # sentence becomes exactly one chunk.
+        sentence = ""
+        while len(sentence) < 430:
+            sentence += rng.choice(words) + " "
+        sentences.append(sentence.strip() + ".")
+    text = " ".join(sentences)
+    if len(text) <= 900:
+        text = text.replace(".", "") + " " + " ".join(rng.choice(words) for _ in range(120))
+    return text
+
+
+def run_case(fn, min_time, min_iterations, max_iterations):
+    fn()  # warm caches and lazy loads outside the measurement
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_iterations and (
+        len(samples) < min_iterations or time.perf_counter() - started < min_time
+    ):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    total = sum(samples)
+    return {
+        "iterations": len(samples),
+        "ops_per_sec": len(samples) / total if total > 0 else 0.0,
+        "mean_ms": total / len(samples) * 1000.0,
+        "p50_ms": percentile(samples, 50) * 1000.0,
+        "p95_ms": percentile(samples, 95) * 1000.0,
+        "p99_ms": percentile(samples, 99) * 1000.0,
+    }
+
+
+def build_cases(quick):
+    cases = {}
+    cleaned = [preprocess_text(t) for t in SHORT_TEXTS]
+
+    def cycle(items):
+        state = {"i": 0}
+
+        def next_item():
+            state["i"] += 1
+            return items[state["i"] % len(items)]
+        return next_item
+
+    next_short = cycle(SHORT_TEXTS)
+    next_pair = cycle(list(zip(SHORT_TEXTS, cleaned)))
+    cases["preprocess_text"] = lambda: preprocess_text(next_short())
+    cases["predict_fallback"] = lambda: model_service._predict_fallback(*next_pair())
+    cases["predict_single_short"] = lambda: model_service._predict_single(next_short())
+
+    for n in (1, 10, 100):
+        text = _long_text(n)
+        cases[f"predict_emotion_long_{n}_chunks"] = lambda text=text: model_service.predict_emotion(text)
+
+    long_100 = _long_text(100)
+    cases["split_long_text_100_chunks"] = lambda: model_service._split_long_text(long_100)
+    chunk_preds = [
+        model_service._predict_single(chunk, log_prediction=False) + (len(chunk),)
+        for chunk in model_service._split_long_text(long_100)
+    ]
+    cases["aggregate_chunk_predictions_100"] = lambda: model_service._aggregate_chunk_predictions(chunk_preds)
+
+    if not quick:
+        cases["train_from_mongo[big_messages]"] = _training_case(["emotion_training_big_messages.csv"])
+        cases["train_from_mongo[large]"] = _training_case(["emotion_training_large.csv"])
+    return cases
+
+
+def _training_case(csv_names):
+    rows = []
+    for name in csv_names:
+        with open(os.path.join(DATA_DIR, name), newline="", encoding="utf-8") as fh:
+            rows.extend({"text": t, "label": y} for t, y in iter_csv_records(fh) if t and y)
+
+    def train():
+        mongo.db.datasets._docs = []
+        mongo.db.models._docs = []
+        mongo.db.datasets.insert_many([dict(r) for r in rows])
+        result = training_service.train_from_mongo()
+        if "error" in result:
+            raise RuntimeError(result["error"])
+    return train
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("ops_per_sec"):
+            continue
+        change = current["ops_per_sec"] / base["ops_per_sec"] - 1.0
+        p95_change = current["p95_ms"] / base["p95_ms"] - 1.0 if base.get("p95_ms") else 0.0
+        status = "ok"
+        if change < -threshold or p95_change > threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif change > threshold:
+            status = "faster"
+        print(f"{status:>10}  {name:<45} ops/s {change:+7.1%}  p95 {p95_change:+7.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout).")
+    parser.add_argument("--compare", help="Baseline JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown fraction.")
+    parser.add_argument("--filter", help="Only run cases whose name contains this string.")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds per case.")
+    parser.add_argument("--quick", action="store_true", help="Skip the training cases.")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="emotion-bench-")
+    artifact_store.ML_DIR = work_dir
+    training_service.ML_DIR = work_dir
+    for name in ("emotion_model.pkl", "vectorizer.pkl"):
+        src = os.path.join(BASE_DIR, "ml", name)
+        if os.path.exists(src):
+            shutil.copy(src, work_dir)
+    model_service.ML_DIR = work_dir
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["PREDICTION_LOG_MODE"] = os.environ.get("PREDICTION_LOG_MODE", "full")
+    results = {}
+    try:
+        with app.app_context():
+            fake_mongo.install(mongo)
+            for name, fn in build_cases(args.quick).items():
+                if args.filter and args.filter not in name:
+                    continue
+                training = name.startswith("train_from_mongo")
+                results[name] = run_case(
+                    fn,
+                    min_time=0 if training else args.min_time,
+                    min_iterations=3 if training else 20,
+                    max_iterations=3 if training else 1_000_000,
+                )
+                print(f"{name:<45} {results[name]['ops_per_sec']:>12.1f} ops/s  "
+                      f"p50 {results[name]['p50_ms']:.3f} ms  p99 {results[name]['p99_ms']:.3f} ms",
+                      file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "spacy_model_loaded": nlp_pipeline.get_nlp() is not None,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    elif not args.compare:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""Helpers shared by the benchmark scripts (run with the repo root on sys.path)."""
+from app.services.metrics import percentile  # noqa: F401
+
+SHORT_TEXTS = [
+    "I am so happy today, everything worked out!",
+    "Why would anyone do that? I don't understand.",
+    "I'm really scared about the results tomorrow",
+    "Thanks a lot for helping me move, you're the best",
+    "This is fine, nothing special happened.",
+    "I can't stand this anymore, leave me alone",
+    "wow I did not see that coming at all",
+    "I miss her so much, the house feels empty",
+]
@@ -0,0 +1,215 @@
+"""Parity check and memory/throughput comparison for the compact serving vectorizer.
+
+Every vectorizer under test is run over the training CSVs (raw and
+preprocessed, as at serving time) plus edge cases, and the compact
+vectorizer's sparse rows must equal sklearn's exactly: same indices, same
+float values. Any mismatch exits non-zero before timings are reported.
+
+    python benchmarks/bench_vectorizer.py
+    python benchmarks/bench_vectorizer.py --vectorizer path/to/vectorizer.pkl --output vec.json
+
+Cases: the shipped ml/vectorizer.pkl, its compact_model() variant (pruned
+vocabulary, float32), two small vectorizers covering the other weighting
+options, and a 50k-feature unigram+bigram vectorizer fitted here to match
+the training configuration at full size.
+"""
+import argparse
+import copy
+import gc
+import io
+import json
+import os
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BASE_DIR)
+
+import joblib  # noqa: E402
+import numpy as np  # noqa: E402
+from sklearn.feature_extraction.text import TfidfVectorizer  # noqa: E402
+from sklearn.linear_model import LogisticRegression  # noqa: E402
+from app.services.compaction_service import compact_model  # noqa: E402
+from app.services.dataset_service import iter_csv_records  # noqa: E402
+from app.services.serving_vectorizer import CompactTfidfVectorizer  # noqa: E402
+
+DATA_DIR = os.path.join(BASE_DIR, "data")
+EDGE_CASES = [
+    "",
+    "   ",
+    "a",
+    "I I I I am am am",
+    "HAPPY Happy happy",
+    "naïve café — déjà vu, straße",
+    "emoji 😀 only 😀😀",
+    "tab\tseparated\nnew line",
+    "under_score snake_case words_with_digits 123 4567",
+    "repeat " * 200,
+]
+
+
+def load_texts():
+    from app.services.nlp_pipeline import preprocess_text
+
+    texts = []
+    for name in sorted(os.listdir(DATA_DIR)):
+        if name.endswith(".csv"):
+            with open(os.path.join(DATA_DIR, name), encoding="utf-8-sig", newline="") as fh:
+                texts.extend(text for text, _ in iter_csv_records(fh) if text)
+    cleaned = [preprocess_text(t) for t in texts]
+    return texts, cleaned
+
+
+def synthetic_corpus(seed_texts, n_docs, vocab_size, seed=7):
+    # Real sentences with made-up words mixed in, so a 50k vocabulary fills up
+    # with a realistic share of bigrams.
+    rng = random.Random(seed)
+    words = [f"w{i:05d}" for i in range(vocab_size)]
+    docs = []
+    for _ in range(n_docs):
+        base = rng.choice(seed_texts).split()
+        extra = [rng.choice(words) for _ in range(rng.randint(3, 12))]
+        mixed = base + extra
+        rng.shuffle(mixed)
+        docs.append(" ".join(mixed))
+    return docs
+
+
+def rows_equal(expected, actual):
+    expected, actual = expected.tocsr(), actual.tocsr()
+    return (
+        expected.shape == actual.shape
+        and expected.dtype == actual.dtype
+        and np.array_equal(expected.indptr, actual.indptr)
+        and np.array_equal(expected.indices, actual.indices)
+        and np.array_equal(expected.data, actual.data)
+    )
+
+
+def check_parity(name, vectorizer, compact, docs):
+    failures = []
+    for doc in docs:
+        if not rows_equal(vectorizer.transform([doc]), compact.transform([doc])):
+            failures.append(doc)
+    if not rows_equal(vectorizer.transform(docs), compact.transform(docs)):
+        failures.append("<batch>")
+    status = "ok" if not failures else f"{len(failures)} MISMATCHES"
+    print(f"parity {name:<12} {len(docs)} docs: {status}", file=sys.stderr)
+    for doc in failures[:5]:
+        print(f"    {doc[:80]!r}", file=sys.stderr)
+    return not failures
+
+
+def retained_bytes(build):
+    # Heap still held by whatever build() returns, measured after a collection.
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def transform_stats(vectorizer, docs, min_time):
+    # Allocation peak of a single-document transform (the _predict_single
+    # call shape), then throughput over the corpus.
+    tracemalloc.start()
+    peaks = []
+    for doc in docs[:200]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        vectorizer.transform([doc])
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_time:
+        for doc in docs:
+            vectorizer.transform([doc])
+        count += len(docs)
+    elapsed = time.perf_counter() - started
+    return {"transforms_per_sec": count / elapsed, "alloc_peak_bytes_p50": int(np.median(peaks))}
+
+
+def build_cases(vectorizer_path, texts, cleaned, vocab_size):
+    cases = {}
+    shipped = pickle.dumps(joblib.load(vectorizer_path))
+    cases["shipped"] = shipped
+
+    vectorizer = pickle.loads(shipped)
+    labels = np.arange(len(cleaned)) % 5
+    model = LogisticRegression(max_iter=200).fit(vectorizer.transform(cleaned), labels)
+    _, small_vectorizer, _ = compact_model(model, vectorizer, dtype="float32")
+    cases["compacted"] = pickle.dumps(small_vectorizer)
+
+    # Other settings the compact path supports, so each weighting branch is checked.
+    variant = TfidfVectorizer(ngram_range=(1, 1), norm="l1", binary=True, dtype=np.float32).fit(cleaned)
+    cases["variant_l1"] = pickle.dumps(variant)
+    bigrams_only = TfidfVectorizer(ngram_range=(2, 2), use_idf=False, norm=None).fit(cleaned)
+    cases["bigrams_raw"] = pickle.dumps(bigrams_only)
+
+    if vocab_size:
+        corpus = synthetic_corpus(cleaned, n_docs=vocab_size, vocab_size=vocab_size // 2)
+        fitted = TfidfVectorizer(max_features=vocab_size, ngram_range=(1, 2), sublinear_tf=True).fit(corpus)
+        cases[f"fitted_{len(fitted.vocabulary_) // 1000}k"] = pickle.dumps(fitted)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectorizer", default=os.path.join(BASE_DIR, "ml", "vectorizer.pkl"))
+    parser.add_argument("--vocab-size", type=int, default=50000, help="Size of the fitted case (0 skips it).")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds of transforms per measurement.")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout).")
+    args = parser.parse_args()
+
+    texts, cleaned = load_texts()
+    docs = cleaned + texts + EDGE_CASES + [t.encode("utf-8") for t in EDGE_CASES[3:6]]
+    cases = build_cases(args.vectorizer, texts, cleaned, args.vocab_size)
+
+    ok = True
+    results = {}
+    for name, blob in cases.items():
+        vectorizer = pickle.loads(blob)
+        compact = CompactTfidfVectorizer(copy.deepcopy(vectorizer))
+        ok = check_parity(name, vectorizer, compact, docs + synthetic_corpus(cleaned, 500, 1000)) and ok
+        del vectorizer, compact
+
+        # Each side is measured as a worker would hold it: the unpickled
+        # sklearn object versus only what the compact vectorizer keeps.
+        original, original_bytes = retained_bytes(lambda: pickle.loads(blob))
+        compact, compact_bytes = retained_bytes(lambda: CompactTfidfVectorizer(pickle.loads(blob)))
+        results[name] = {
+            "features": compact.n_features,
+            "words": len(compact._words),
+            "retained_bytes": {"sklearn": original_bytes, "compact": compact_bytes},
+            "sklearn": transform_stats(original, cleaned, args.min_time),
+            "compact": transform_stats(compact, cleaned, args.min_time),
+        }
+        r = results[name]
+        print(
+            f"{name:<12} {r['features']:>6} features  "
+            f"heap {original_bytes / 1e6:6.2f} MB -> {compact_bytes / 1e6:6.2f} MB  "
+            f"transform {r['sklearn']['transforms_per_sec']:8.0f} -> {r['compact']['transforms_per_sec']:8.0f}/s  "
+            f"alloc/transform {r['sklearn']['alloc_peak_bytes_p50']} -> {r['compact']['alloc_peak_bytes_p50']} B",
+            file=sys.stderr,
+        )
+        del original, compact
+
+    payload = json.dumps({"parity": ok, "cases": results}, indent=2)
+    if args.output:
+        with io.open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
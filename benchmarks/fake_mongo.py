@@ -0,0 +1,203 @@
+"""In-memory stand-in for the parts of PyMongo the app uses, for offline runs."""
+import copy
+from types import SimpleNamespace
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne, UpdateOne
+
+_MISSING = object()
+
+
+def _get(doc, dotted):
+    value = doc
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _match_value(value, cond):
+    if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+        for op, arg in cond.items():
+            if op == "$exists":
+                if (value is not _MISSING) != bool(arg):
+                    return False
+            elif op == "$in":
+                if value not in arg:
+                    return False
+            elif op == "$ne":
+                if value == arg:
+                    return False
+            elif value is _MISSING or value is None:
+                return False
+            elif op == "$lt" and not value < arg:
+                return False
+            elif op == "$lte" and not value <= arg:
+                return False
+            elif op == "$gt" and not value > arg:
+                return False
+            elif op == "$gte" and not value >= arg:
+                return False
+        return True
+    return value == cond
+
+
+def _matches(doc, query):
+    for key, cond in (query or {}).items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+        elif not _match_value(_get(doc, key), cond):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v}
+    if include:
+        out = {k: copy.deepcopy(v) for k, v in doc.items() if k.split(".")[0] in {i.split(".")[0] for i in include}}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        elif "_id" in out and not projection.get("_id", 1):
+            out.pop("_id")
+        return out
+    return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction=1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self._docs.sort(key=lambda d: (_get(d, field) is _MISSING, _get(d, field)), reverse=order < 0)
+        return self
+
+    def limit(self, n):
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+
+class FakeCollection:
+    def __init__(self, name, database=None):
+        self.name = name
+        self.database = database
+        self._docs = []
+        self._indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    def _insert(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self._docs.append(copy.deepcopy(doc))
+        return doc["_id"]
+
+    def insert_one(self, doc):
+        return SimpleNamespace(inserted_id=self._insert(doc))
+
+    def insert_many(self, docs, ordered=True):
+        return SimpleNamespace(inserted_ids=[self._insert(d) for d in docs])
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([_project(d, projection) for d in self._docs if _matches(d, query)])
+
+    def find_one(self, query=None, projection=None):
+        return next(iter(self.find(query, projection)), None)
+
+    def count_documents(self, query):
+        return sum(1 for d in self._docs if _matches(d, query))
+
+    def _apply_update(self, doc, update, inserting=False):
+        for field, value in update.get("$set", {}).items():
+            doc[field] = value
+        for field, value in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + value
+        if inserting:
+            for field, value in update.get("$setOnInsert", {}).items():
+                doc[field] = value
+
+    def update_one(self, query, update, upsert=False):
+        for doc in self._docs:
+            if _matches(doc, query):
+                self._apply_update(doc, update)
+                return SimpleNamespace(matched_count=1)
+        if upsert:
+            doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            self._apply_update(doc, update, inserting=True)
+            self._insert(doc)
+        return SimpleNamespace(matched_count=0)
+
+    def update_many(self, query, update):
+        matched = [d for d in self._docs if _matches(d, query)]
+        for doc in matched:
+            self._apply_update(doc, update)
+        return SimpleNamespace(matched_count=len(matched))
+
+    def replace_one(self, query, replacement):
+        for i, doc in enumerate(self._docs):
+            if _matches(doc, query):
+                self._docs[i] = copy.deepcopy(dict(replacement, _id=doc["_id"]))
+                return SimpleNamespace(matched_count=1)
+        return SimpleNamespace(matched_count=0)
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            doc = op._doc
+            if isinstance(op, UpdateOne):
+                self.update_one(op._filter, doc, upsert=bool(op._upsert))
+            elif isinstance(op, ReplaceOne):
+                self.replace_one(op._filter, doc)
+            elif isinstance(op, InsertOne):
+                self._insert(doc)
+        return SimpleNamespace(acknowledged=True)
+
+    def create_index(self, keys, **options):
+        keys = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        name = options.get("name") or "_".join(f"{k}_{d}" for k, d in keys)
+        self._indexes[name] = dict({"key": keys}, **{k: v for k, v in options.items() if k != "name"})
+        return name
+
+    def index_information(self):
+        return copy.deepcopy(self._indexes)
+
+    def drop_index(self, name):
+        self._indexes.pop(name, None)
+
+
+class FakeDatabase:
+    def __init__(self, name="emotion_system"):
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name, self)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def command(self, *args, **kwargs):
+        return {"ok": 1}
+
+
+class FakeMongoClient:
+    def __init__(self):
+        self.db = FakeDatabase()
+
+    def close(self):
+        pass
+
+
+def install(mongo):
+    client = FakeMongoClient()
+    mongo.cx = client
+    mongo.db = client.db
+    return client.db
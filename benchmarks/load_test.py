@@ -0,0 +1,479 @@
+"""End-to-end HTTP load generator for /predict.
+
+By default it starts one or more app processes from create_app(). The
+processes share a throwaway SQLite database, and each installs its own
+in-memory Mongo stand-in, so Mongo state (prediction logs, rollups) is not
+shared between them. It registers load-test users and logs them in through
+/auth/login, then drives POST /predict/ with a
+mix of short JSON texts, long .txt uploads and screenshot images. Use --url
+instead to load an already running deployment.
+
+    # closed loop: 16 clients for 30s against 2 worker processes
+    python benchmarks/load_test.py --workers 2 --concurrency 16 --duration 30
+
+    # open loop: 50 req/s, latency counted from the scheduled send time
+    python benchmarks/load_test.py --rate 50 --duration 60 --mix short=70,long=25,image=5
+
+    # replay a recorded corpus (JSONL with "text" or "file", or one text per line)
+    python benchmarks/load_test.py --replay corpus.jsonl --concurrency 8 --requests 2000
+
+Reports throughput, latency percentiles, error rates and 429 rejections per
+request kind. For local workers it also reports server CPU seconds, so
+capacity can be read per worker and per core.
+"""
+import argparse
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_utils import SHORT_TEXTS, percentile  # noqa: E402
+
+DATA_DIR = os.path.join(BASE_DIR, "data")
+PASSWORD = "load-test-password"
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _serve(conn, work_dir, keep_rate_limits):
+    from werkzeug.serving import make_server
+    from app import config as app_config
+    from app import create_app
+    from app.extensions import mongo
+    import fake_mongo
+
+    cfg = app_config.Config
+    cfg.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(work_dir, 'users.db')}"
+    cfg.METRICS_DIR = os.path.join(work_dir, "metrics")
+    cfg.PROFILE_DIR = os.path.join(work_dir, "profiles")
+    cfg.MONGO_ENSURE_INDEXES = False
+    cfg.JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=12)
+    cfg.QUOTA_DB = os.path.join(work_dir, "quota.db")
+    if not keep_rate_limits:
+        cfg.RATELIMIT_ENABLED = False
+        cfg.QUOTA_ENABLED = False
+
+    app = create_app()
+    fake_mongo.install(mongo)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    conn.send(server.server_port)
+    while True:
+        command = conn.recv()
+        conn.send(time.process_time())
+        if command == "stop":
+            break
+    server.shutdown()
+
+
+class LocalWorkers:
+    def __init__(self, count, keep_rate_limits):
+        self.work_dir = tempfile.mkdtemp(prefix="emotion-load-")
+        self.processes = []
+        ctx = multiprocessing.get_context("spawn")
+        # Started one at a time so create_all/migrations never race on the shared SQLite file.
+        for _ in range(count):
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(target=_serve, args=(child_conn, self.work_dir, keep_rate_limits), daemon=True)
+            proc.start()
+            port = parent_conn.recv()
+            self.processes.append((proc, parent_conn, f"http://127.0.0.1:{port}"))
+
+    @property
+    def urls(self):
+        return [url for _, _, url in self.processes]
+
+    def _ask(self, command):
+        cpu_seconds = 0.0
+        for _, conn, _ in self.processes:
+            try:
+                conn.send(command)
+                cpu_seconds += conn.recv()
+            except (EOFError, OSError):
+                pass
+        return cpu_seconds
+
+    def cpu_seconds(self):
+        return self._ask("cpu")
+
+    def stop(self):
+        cpu_seconds = self._ask("stop")
+        for proc, _, _ in self.processes:
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        return cpu_seconds
+
+
+def _http(method, url, body=None, headers=None, timeout=60):
+    req = urllib.request.Request(url, data=body, headers=headers or {}, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read()
+
+
+def _post_json(url, payload, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return _http("POST", url, json.dumps(payload).encode("utf-8"), headers)
+
+
+def obtain_tokens(base_url, users, email=None, password=None):
+    if email:
+        accounts = [(email, password)]
+    else:
+        run_id = uuid.uuid4().hex[:8]
+        accounts = [(f"load-{run_id}-{i}@example.com", PASSWORD) for i in range(users)]
+        for account_email, account_password in accounts:
+            status, body = _post_json(f"{base_url}/auth/register", {"email": account_email, "password": account_password})
+            if status != 200:
+                raise SystemExit(f"register failed ({status}): {body[:200]!r}")
+
+    tokens = []
+    for account_email, account_password in accounts:
+        status, body = _post_json(f"{base_url}/auth/login", {"email": account_email, "password": account_password})
+        if status != 200:
+            raise SystemExit(f"login failed for {account_email} ({status}): {body[:200]!r}")
+        tokens.append(json.loads(body)["access_token"])
+    return tokens
+
+
+def _multipart(filename, content, content_type):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _corpus_texts():
+    from app.services.dataset_service import iter_csv_records
+
+    texts = []
+    for name in ("emotion_training_large.csv", "emotion_training_big_messages.csv"):
+        path = os.path.join(DATA_DIR, name)
+        if os.path.exists(path):
+            with open(path, newline="", encoding="utf-8") as fh:
+                texts.extend(t for t, _ in iter_csv_records(fh) if t)
+    return texts or list(SHORT_TEXTS)
+
+
+def _render_screenshot(lines):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (900, 40 + 36 * len(lines)), "white")
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((24, 20 + 36 * i), line[:110], fill="black")
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def build_generators(args, rng):
+    # Each generator returns (body, content_type); payloads are pre-built so
+    # the client spends its time waiting on the server, not encoding.
+    texts = _corpus_texts()
+
+    def long_text():
+        parts = []
+        while sum(len(p) + 1 for p in parts) < args.long_chars:
+            parts.append(rng.choice(texts))
+        return " ".join(parts)
+
+    short_payloads = [json.dumps({"text": t}).encode("utf-8") for t in SHORT_TEXTS + rng.sample(texts, min(200, len(texts)))]
+    long_payloads = [_multipart("message.txt", long_text().encode("utf-8"), "text/plain") for _ in range(20)]
+
+    images = []
+    if args.image_dir:
+        for name in sorted(os.listdir(args.image_dir)):
+            with open(os.path.join(args.image_dir, name), "rb") as fh:
+                images.append((name, fh.read()))
+    else:
+        try:
+            images = [(f"chat-{i}.png", _render_screenshot(rng.sample(texts, 6))) for i in range(10)]
+        except ImportError:
+            images = []
+    image_payloads = [_multipart(name, data, "image/png") for name, data in images]
+
+    pools = {
+        "short": [(p, "application/json") for p in short_payloads],
+        "long": long_payloads,
+        "image": image_payloads,
+    }
+    return {kind: (lambda pool=pool: rng.choice(pool)) for kind, pool in pools.items() if pool}
+
+
+def load_replay(path):
+    entries = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                if record.get("file"):
+                    file_path = record["file"]
+                    with open(file_path, "rb") as f:
+                        content = f.read()
+                    is_text = file_path.lower().endswith((".txt", ".csv"))
+                    payload = _multipart(os.path.basename(file_path), content, "text/plain" if is_text else "image/png")
+                    entries.append(("long" if is_text else "image", payload))
+                    continue
+                line = record.get("text", "")
+            entries.append(("short", (json.dumps({"text": line}).encode("utf-8"), "application/json")))
+    if not entries:
+        raise SystemExit(f"replay corpus {path} is empty")
+    return entries
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, kind, seconds, status):
+        with self.lock:
+            self.samples.setdefault(kind, []).append((seconds, status))
+
+    def summary(self, elapsed):
+        report = {}
+        everything = []
+        for kind, samples in sorted(self.samples.items()):
+            report[kind] = _summarize(samples, elapsed)
+            everything.extend(samples)
+        report["all"] = _summarize(everything, elapsed)
+        return report
+
+
+def _summarize(samples, elapsed):
+    latencies = sorted(s for s, _ in samples)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok = sum(1 for _, status in samples if isinstance(status, int) and 200 <= status < 300)
+    rejected = statuses.get("429", 0)
+    total = len(samples)
+    out = {
+        "requests": total,
+        "ok": ok,
+        "rate_limited": rejected,
+        "errors": total - ok - rejected,
+        "error_rate": (total - ok - rejected) / total if total else 0.0,
+        "throughput_per_sec": total / elapsed if elapsed else 0.0,
+        "ok_per_sec": ok / elapsed if elapsed else 0.0,
+        "status_counts": statuses,
+        "mean_ms": sum(latencies) / total * 1000.0 if total else 0.0,
+        "max_ms": latencies[-1] * 1000.0 if latencies else 0.0,
+    }
+    for pct in PERCENTILES:
+        out[f"p{pct}_ms"] = percentile(latencies, pct) * 1000.0
+    return out
+
+
+def run_load(args, urls, tokens, next_request):
+    recorder = Recorder()
+    url_cycle = itertools.cycle(urls)
+    token_cycle = itertools.cycle(tokens)
+    cycle_lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    remaining = {"n": args.requests}
+
+    def take():
+        with cycle_lock:
+            if remaining["n"] is not None:
+                if remaining["n"] <= 0:
+                    return None
+                remaining["n"] -= 1
+            kind, (body, content_type) = next_request()
+            return kind, body, content_type, next(url_cycle), next(token_cycle)
+
+    def send(job, scheduled_at):
+        kind, body, content_type, base_url, token = job
+        headers = {"Content-Type": content_type, "Authorization": f"Bearer {token}"}
+        try:
+            status, _ = _http("POST", f"{base_url}/predict/", body, headers, timeout=args.timeout)
+        except Exception as exc:
+            status = type(exc).__name__
+        recorder.record(kind, time.perf_counter() - scheduled_at, status)
+
+    def expired():
+        return deadline is not None and time.perf_counter() >= deadline
+
+    started = time.perf_counter()
+    if args.rate:
+        # Open loop: requests go out on a fixed schedule regardless of how fast
+        # the server answers, and latency includes any time spent queued.
+        interval = 1.0 / args.rate
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for i in itertools.count():
+                scheduled_at = started + i * interval
+                if expired():
+                    break
+                job = take()
+                if job is None:
+                    break
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, job, scheduled_at)
+    else:
+        def client():
+            while not expired():
+                job = take()
+                if job is None:
+                    return
+                send(job, time.perf_counter())
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return recorder, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target a running server instead of starting local workers.")
+    parser.add_argument("--email", help="Existing account to log in with (required with --url).")
+    parser.add_argument("--password", help="Password for --email.")
+    parser.add_argument("--workers", type=int, default=1, help="Local app processes to start.")
+    parser.add_argument("--users", type=int, default=4, help="Load-test accounts to register locally.")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="Leave Flask-Limiter and the prediction quota enabled on local workers "
+                             "(off by default to measure capacity).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads (max in flight with --rate).")
+    parser.add_argument("--rate", type=float, help="Target requests/sec (open loop); default is closed loop.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (0 = until --requests).")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests.")
+    parser.add_argument("--warmup", type=int, default=20, help="Unrecorded requests sent first.")
+    parser.add_argument("--mix", default="short=80,long=15,image=5", help="Weights per request kind.")
+    parser.add_argument("--long-chars", type=int, default=6000, help="Size of generated .txt uploads.")
+    parser.add_argument("--image-dir", help="Use screenshots from this directory instead of rendered ones.")
+    parser.add_argument("--replay", help="Replay this corpus in order instead of --mix.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout).")
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        parser.error("set --duration or --requests")
+    if args.url and not (args.email and args.password):
+        parser.error("--url needs --email and --password")
+
+    rng = random.Random(args.seed)
+    if args.replay:
+        entries = load_replay(args.replay)
+        replay_cycle = itertools.cycle(entries)
+        next_request = lambda: next(replay_cycle)  # noqa: E731
+        mix = None
+    else:
+        generators = build_generators(args, rng)
+        mix = {k: w for k, w in parse_mix(args.mix).items() if w > 0}
+        missing = [k for k in mix if k not in generators]
+        if missing:
+            print(f"skipping request kinds with no payloads: {', '.join(missing)}", file=sys.stderr)
+            mix = {k: w for k, w in mix.items() if k in generators}
+        if not mix:
+            parser.error("--mix selects no usable request kinds")
+        kinds, weights = list(mix), list(mix.values())
+
+        def next_request():
+            kind = rng.choices(kinds, weights)[0]
+            return kind, generators[kind]()
+
+    workers = None
+    if args.url:
+        urls = [args.url.rstrip("/")]
+    else:
+        workers = LocalWorkers(args.workers, args.keep_rate_limits)
+        urls = workers.urls
+
+    server_cpu = None
+    try:
+        tokens = obtain_tokens(urls[0], args.users, args.email, args.password)
+        if args.warmup:
+            warm = argparse.Namespace(**dict(vars(args), duration=0, requests=args.warmup, rate=None))
+            run_load(warm, urls, tokens, next_request)
+        # Startup and warm-up CPU is subtracted so only the measured window counts.
+        cpu_before = workers.cpu_seconds() if workers else 0.0
+        recorder, elapsed = run_load(args, urls, tokens, next_request)
+        if workers:
+            server_cpu = workers.cpu_seconds() - cpu_before
+    finally:
+        if workers:
+            workers.stop()
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "target": args.url or f"local x{args.workers}",
+            "mode": f"open loop {args.rate}/s" if args.rate else f"closed loop x{args.concurrency}",
+            "concurrency": args.concurrency,
+            "mix": mix,
+            "replay": args.replay,
+            "elapsed_seconds": elapsed,
+            "client_cpu_count": os.cpu_count(),
+        },
+        "results": recorder.summary(elapsed),
+    }
+    if server_cpu is not None:
+        total = report["results"]["all"]["requests"]
+        report["meta"]["server_cpu_seconds"] = server_cpu
+        report["capacity"] = {
+            "requests_per_sec_per_worker": total / elapsed / args.workers if elapsed else 0.0,
+            "requests_per_cpu_second": total / server_cpu if server_cpu else 0.0,
+        }
+
+    for kind, stats in report["results"].items():
+        print(
+            f"{kind:<6} {stats['requests']:>7} req  {stats['throughput_per_sec']:>8.1f}/s  "
+            f"p50 {stats['p50_ms']:.1f}  p95 {stats['p95_ms']:.1f}  p99 {stats['p99_ms']:.1f} ms  "
+            f"errors {stats['error_rate']:.1%}  429s {stats['rate_limited']}",
+            file=sys.stderr,
+        )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Score a large CSV or JSONL file offline with the serving prediction logic.
+
+    python ml/score_bulk.py messages.csv scored.jsonl --workers 8
+    python ml/score_bulk.py messages.jsonl scored.csv --text-column body --id-column message_id
+    python ml/score_bulk.py messages.csv scored.msgpack --top-k 3 --round 3
+
+Rows are sharded across worker processes in batches. Each worker loads the
+model once, and results are written in input order. Progress is checkpointed
+to <output>.ckpt.json after every batch, so re-running the same command after
+an interruption continues where it stopped. Predictions are not logged to
+MongoDB.
+
+--top-k adds the k most likely labels per row, the same shape /predict returns
+for ?top_k=. A .msgpack output is a stream of MessagePack maps (one per row,
+float32 numbers) and needs the msgpack package.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from multiprocessing import Pool
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BASE_DIR)
+
+OUTPUT_FIELDS = ["id", "emotion", "confidence", "chars", "long_text_mode", "error"]
+
+_worker = {}
+
+
+def resolve_artifacts(args):
+    from app.services import artifact_store
+    from app.services.model_service import ML_DIR, serving_artifact_paths
+
+    if args.model or args.vectorizer:
+        if not (args.model and args.vectorizer):
+            raise SystemExit("--model and --vectorizer must be given together")
+        return args.model, args.vectorizer, "custom"
+    record = artifact_store.read_version(args.version) if args.version else artifact_store.read_current()
+    if args.version and not record:
+        raise SystemExit(f"unknown model version {args.version}")
+    if record:
+        model_path, vec_path = serving_artifact_paths(record)
+        return model_path, vec_path, record.get("version")
+    return os.path.join(ML_DIR, "emotion_model.pkl"), os.path.join(ML_DIR, "vectorizer.pkl"), "default"
+
+
+def _init_worker(model_path, vec_path, top_k=None, digits=6):
+    import joblib
+    from app.services.compaction_service import restore_serving_dtype
+    from app.services.serving_vectorizer import compact_vectorizer
+
+    model, vectorizer = restore_serving_dtype(joblib.load(model_path), joblib.load(vec_path))
+    _worker["model"], _worker["vectorizer"] = model, compact_vectorizer(vectorizer)
+    _worker["top_k"], _worker["digits"] = top_k, digits
+
+
+def score_batch(rows):
+    from app.services.model_service import predict_emotion
+    from app.utils.responses import shape_scores
+    from app.utils.security import sanitize_text
+
+    results = []
+    for row_id, raw in rows:
+        text = sanitize_text(raw or "")
+        if not text:
+            results.append({"id": row_id, "error": "Empty input"})
+            continue
+        pred, probs = predict_emotion(text, _worker["model"], _worker["vectorizer"], log_prediction=False)
+        result = {
+            "id": row_id,
+            "emotion": pred,
+            "confidence": round(float(max(probs)), _worker["digits"]) if probs else 0.0,
+            "chars": len(text),
+            "long_text_mode": len(text) > 900,
+        }
+        if _worker["top_k"]:
+            result.update(shape_scores(probs, _worker["top_k"], _worker["digits"]))
+        results.append(result)
+    return results
+
+
+def iter_rows(path, text_column, id_column):
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as fh:
+            for index, line in enumerate(fh):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                yield record.get(id_column, index) if id_column else index, record.get(text_column, "")
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as fh:
+            reader = csv.DictReader(fh)
+            if text_column not in (reader.fieldnames or []):
+                raise SystemExit(f"column {text_column!r} not found in {path}")
+            for index, record in enumerate(reader):
+                yield record.get(id_column, index) if id_column else index, record.get(text_column, "")
+
+
+def iter_batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise SystemExit("writing .msgpack output needs the msgpack package (pip install msgpack)")
+    return msgpack
+
+
+class ResultWriter:
+    def __init__(self, path, offset, fields=OUTPUT_FIELDS):
+        self.path = path
+        self.fields = fields
+        self.csv = path.endswith(".csv")
+        self.msgpack = _msgpack() if path.endswith(".msgpack") else None
+        self.fh = open(path, "r+b" if offset else "wb")
+        # Drop anything written after the last checkpoint (a partially flushed batch).
+        self.fh.truncate(offset)
+        self.fh.seek(offset)
+        if self.csv and not offset:
+            self._write_csv([dict(zip(fields, fields))])
+
+    def _write_csv(self, results):
+        import io
+
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=self.fields, extrasaction="ignore", lineterminator="\n")
+        writer.writerows(
+            dict(r, top_emotions=json.dumps(r["top_emotions"])) if isinstance(r.get("top_emotions"), list) else r
+            for r in results
+        )
+        self.fh.write(buf.getvalue().encode("utf-8"))
+
+    def write(self, results):
+        if self.csv:
+            self._write_csv(results)
+        elif self.msgpack:
+            self.fh.write(b"".join(self.msgpack.packb(r, use_single_float=True) for r in results))
+        else:
+            self.fh.write("".join(json.dumps(r) + "\n" for r in results).encode("utf-8"))
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        return self.fh.tell()
+
+    def close(self):
+        self.fh.close()
+
+
+def load_checkpoint(path, fingerprint):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            checkpoint = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("fingerprint") != fingerprint:
+        raise SystemExit(f"{path} belongs to a different run; pass --restart to start over")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(checkpoint, fh)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV (with a header) or .jsonl file to score.")
+    parser.add_argument("output", help="Results file; .csv writes CSV, .msgpack MessagePack, anything else JSONL.")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--id-column", help="Carried through to the output (default: row number).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per task and per checkpoint.")
+    parser.add_argument("--version", help="Score with this stored model version instead of the current one.")
+    parser.add_argument("--model", help="Explicit model .pkl (with --vectorizer).")
+    parser.add_argument("--vectorizer", help="Explicit vectorizer .pkl (with --model).")
+    parser.add_argument("--top-k", type=int, help="Also write the k most likely labels per row.")
+    parser.add_argument("--round", type=int, default=6, help="Decimal places for confidences (default 6).")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and overwrite the output.")
+    args = parser.parse_args()
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+
+    model_path, vec_path, version = resolve_artifacts(args)
+    checkpoint_path = args.output + ".ckpt.json"
+    fingerprint = {
+        "input": os.path.abspath(args.input),
+        "input_bytes": os.path.getsize(args.input),
+        "input_mtime": os.path.getmtime(args.input),
+        "text_column": args.text_column,
+        "id_column": args.id_column,
+        "model_path": os.path.abspath(model_path),
+        "vectorizer_path": os.path.abspath(vec_path),
+        "top_k": args.top_k,
+        "round": args.round,
+    }
+
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path, fingerprint)
+    if checkpoint is None and os.path.exists(args.output) and not args.restart:
+        raise SystemExit(f"{args.output} exists without a checkpoint; pass --restart to overwrite")
+    checkpoint = checkpoint or {"fingerprint": fingerprint, "rows_done": 0, "output_bytes": 0}
+    if checkpoint["rows_done"]:
+        print(f"resuming after {checkpoint['rows_done']} rows", file=sys.stderr)
+
+    rows = iter_rows(args.input, args.text_column, args.id_column)
+    for _ in range(checkpoint["rows_done"]):
+        next(rows, None)
+
+    fields = OUTPUT_FIELDS[:-1] + ["top_emotions", "error"] if args.top_k else OUTPUT_FIELDS
+    writer = ResultWriter(args.output, checkpoint["output_bytes"], fields)
+    save_checkpoint(checkpoint_path, checkpoint)
+    max_in_flight = max(args.workers, 1) * 2
+    try:
+        with Pool(args.workers, initializer=_init_worker, initargs=(model_path, vec_path, args.top_k, args.round)) as pool:
+            # A bounded window of batches keeps memory flat on huge inputs while
+            # results are still written strictly in input order.
+            pending = deque()
+            batches = iter_batches(rows, args.batch_size)
+            while True:
+                while len(pending) < max_in_flight:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    pending.append((len(batch), pool.apply_async(score_batch, (batch,))))
+                if not pending:
+                    break
+                size, result = pending.popleft()
+                checkpoint["output_bytes"] = writer.write(result.get())
+                checkpoint["rows_done"] += size
+                save_checkpoint(checkpoint_path, checkpoint)
+                if checkpoint["rows_done"] % (args.batch_size * 20) < size:
+                    print(f"{checkpoint['rows_done']} rows scored", file=sys.stderr)
+    finally:
+        writer.close()
+
+    os.remove(checkpoint_path)
+    print(f"scored {checkpoint['rows_done']} rows with model {version} -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())